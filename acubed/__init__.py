@@ -0,0 +1,53 @@
+"""Package providing the ACubed stepfile datatypes, connectors and analysis tools.
+
+Classes are exported lazily, so that importing one of them only imports its
+own module and dependencies, and tools that only need Stepfile do not pay for
+requests, pymongo or scikit-learn.
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from acubed.async_connector import AsyncFFRDatabaseConnector
+    from acubed.cache import ResponseCache
+    from acubed.connector import FFRDatabaseConnector, MongoDBConnector
+    from acubed.corpus import ChartCorpus
+    from acubed.datatypes import Stepfile
+    from acubed.features import StepfileFeatureTransformer
+    from acubed.journal import ProgressJournal
+    from acubed.preprocessing import FFRChartTransformer
+    from acubed.search import PatternIndex
+
+EXPORTS = {
+    "AsyncFFRDatabaseConnector": "acubed.async_connector",
+    "ChartCorpus": "acubed.corpus",
+    "FFRChartTransformer": "acubed.preprocessing",
+    "FFRDatabaseConnector": "acubed.connector",
+    "MongoDBConnector": "acubed.connector",
+    "PatternIndex": "acubed.search",
+    "ProgressJournal": "acubed.journal",
+    "ResponseCache": "acubed.cache",
+    "Stepfile": "acubed.datatypes",
+    "StepfileFeatureTransformer": "acubed.features",
+}
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Imports an exported class on first access.
+    """
+    if name not in EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """
+    Lists the module attributes, including exports not imported yet.
+    """
+    return sorted({*globals(), *EXPORTS})
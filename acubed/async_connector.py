@@ -0,0 +1,233 @@
+"""Module providing an asyncio counterpart of the FFR connector."""
+
+import asyncio
+import logging
+import random
+import time
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiohttp
+
+from acubed import metrics
+from acubed.connector import (
+    FFR_API_URL,
+    FFR_PLAYLIST_URL,
+    USER_AGENT,
+    apply_ffr_config,
+    check_chart_format,
+    load_playlist,
+    save_playlist,
+    transform_payload,
+)
+
+if TYPE_CHECKING:
+    from acubed.preprocessing import FFRChartTransformer
+
+MAX_RETRIES = 3
+CONNECTION_BACKOFF = 0.5
+
+
+class AsyncFFRDatabaseConnector:  # pylint: disable=too-many-instance-attributes
+    """
+    Connects to the FFR API via an API key and downloads all public chart data
+    on an asyncio event loop.
+
+    Requests share a single connection pool and are limited by a semaphore, so
+    hundreds of them can be in flight without one thread each. Backoff after a
+    server error is an asyncio.sleep that releases its slot to other requests.
+    Each chart is transformed on the default executor of the event loop as
+    soon as it arrives, so at most concurrency response bodies are held in
+    memory at a time.
+    Failed downloads are retried like in FFRDatabaseConnector.iter_charts, and
+    levels that still fail are stored in self.failed_levels. The playlist is
+    fetched on the first download rather than on construction.
+
+    Parameters:
+        config (Dict[str, Any]): Configuration dictionary to access API on FFR.
+            FFR_API_URL and FFR_PLAYLIST_URL may be set to point the connector
+            at another server, such as a local stand-in, and FFR_ERROR_DELAY
+            to change the seconds waited after a server error.
+            FFR_PLAYLIST_CACHE may be set to a file in which the playlist is
+            kept for FFR_PLAYLIST_CACHE_TTL seconds, one day by default.
+        concurrency (int): Maximum number of requests in flight.
+        chart_format (str): Format in which charts are stored, as in
+            FFRDatabaseConnector.
+    """
+
+    def __init__(
+        self, config: Dict[str, Any], concurrency: int = 128, chart_format: str = "records"
+    ) -> None:
+        """
+        Initialize the AsyncFFRDatabaseConnector with the given configuration.
+        """
+        self.ffr_api_key = None
+        apply_ffr_config(self, config)
+        self.chart_format: str = check_chart_format(chart_format)
+
+        self.concurrency: int = concurrency
+        base_api_url: str = config.get("FFR_API_URL", FFR_API_URL)
+        self.api_url: str = f"{base_api_url}?key={self.ffr_api_key}&action={{}}"
+        self.playlist_url: str = config.get("FFR_PLAYLIST_URL", FFR_PLAYLIST_URL)
+        self.error_delay: float = float(config.get("FFR_ERROR_DELAY", 5))
+        self.playlist_cache: Optional[str] = config.get("FFR_PLAYLIST_CACHE")
+        self.playlist_cache_ttl: float = float(config.get("FFR_PLAYLIST_CACHE_TTL", 86400))
+        self.song_list: Optional[List[Dict[str, Any]]] = None
+        self.failed_levels: List[Any] = []
+
+    @cached_property
+    def transformer(self) -> "FFRChartTransformer":
+        """
+        The transformer applied to every downloaded chart, created on first use.
+        """
+        from acubed.preprocessing import FFRChartTransformer  # pylint: disable=import-outside-toplevel
+
+        return FFRChartTransformer(output=self.chart_format)
+
+    async def get(
+        self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, url: str
+    ) -> Tuple[int, bytes]:
+        """
+        Perform a GET request to the specified URL and return its status code
+        and body. Connection errors are retried up to MAX_RETRIES times, after
+        an exponential backoff with jitter that releases the request's slot.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            async with semaphore:
+                start_time = time.perf_counter()
+                try:
+                    async with session.get(url) as response:
+                        status, content = response.status, await response.read()
+                except aiohttp.ClientConnectionError:
+                    if attempt == MAX_RETRIES:
+                        raise
+                    failed = True
+                else:
+                    failed = False
+            if failed:
+                await asyncio.sleep(
+                    CONNECTION_BACKOFF * 2 ** attempt + random.uniform(0, CONNECTION_BACKOFF)
+                )
+                continue
+            elapsed = time.perf_counter() - start_time
+            logging.info("request was completed in %s seconds [%s]", elapsed, url)
+            metrics.observe("fetch_seconds", elapsed)
+            metrics.count("requests_total")
+            metrics.count("bytes_downloaded_total", len(content))
+            break
+
+        if status != 200:
+            logging.error("request failed, error code %s [%s]", status, url)
+
+        if 500 <= status < 600:
+            metrics.count("server_errors_total")
+            await asyncio.sleep(self.error_delay)
+
+        return status, content
+
+    async def _download_queue(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        queue: List[Tuple[int, Dict[str, Any]]],
+        songs: Dict[int, Dict[str, Any]],
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Downloads and transforms the charts of a queue of (index, song) pairs
+        into songs, returning the pairs whose download failed. At most
+        concurrency songs are in flight, so only their response bodies are
+        held in memory, and every song is transformed as soon as it arrives.
+        """
+        failed: List[Tuple[int, Dict[str, Any]]] = []
+        pending: Set["asyncio.Future[Any]"] = set()
+        for index, song in queue:
+            if len(pending) >= self.concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                _collect(done, songs, failed)
+            pending.add(asyncio.ensure_future(self._download(session, semaphore, index, song)))
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            _collect(done, songs, failed)
+        return sorted(failed, key=lambda pair: pair[0])
+
+    async def _download(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        index: int,
+        song: Dict[str, Any],
+    ) -> Tuple[int, Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Downloads the chart of a song and transforms it on the default executor
+        of the event loop, so that transforms do not hold up other downloads.
+        Returns the index and song together with the chart, or None if the
+        download failed.
+        """
+        url = self.api_url.format(f"chart&level={song['level']}")
+        try:
+            status, content = await self.get(session, semaphore, url)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status, content = 0, b""
+        if status != 200:
+            metrics.count("downloads_failed_total")
+            return index, song, None
+        doc = await asyncio.get_running_loop().run_in_executor(
+            None, transform_payload, self.transformer, song, content
+        )
+        return index, song, dict(doc, index=index)
+
+    async def download_charts(
+        self, retries: int = 3, backoff: float = 1.0
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Downloads chart data for each song in the public engine and
+        preprocesses the data, producing the same output as
+        FFRDatabaseConnector.download_charts.
+
+        Args:
+            retries (int): Number of times failed downloads are retried.
+            backoff (float): Base delay in seconds before retrying failed
+                downloads, doubled on every retry.
+        """
+        songs: Dict[int, Dict[str, Any]] = {}
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            headers={"User-Agent": USER_AGENT},
+        ) as session:
+            if self.song_list is None:
+                self.song_list = load_playlist(self.playlist_cache, self.playlist_cache_ttl)
+            if self.song_list is None:
+                async with session.get(self.playlist_url) as response:
+                    self.song_list = await response.json(content_type=None)
+                save_playlist(self.playlist_cache, self.song_list)
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            queue = list(enumerate(self.song_list))
+            for attempt in range(retries + 1):
+                if attempt:
+                    await asyncio.sleep(backoff * 2 ** (attempt - 1) + random.uniform(0, backoff))
+                queue = await self._download_queue(session, semaphore, queue, songs)
+                if not queue:
+                    break
+
+        self.failed_levels = [song["level"] for _, song in queue]
+        if self.failed_levels:
+            logging.error("levels failed permanently: %s", self.failed_levels)
+        return {songs[index]["_id"]: songs[index] for index in sorted(songs)}
+
+
+def _collect(
+    done: Iterable["asyncio.Future[Any]"],
+    songs: Dict[int, Dict[str, Any]],
+    failed: List[Tuple[int, Dict[str, Any]]],
+) -> None:
+    """
+    Stores the charts of completed downloads in songs by index, and adds the
+    (index, song) pairs of failed downloads to failed.
+    """
+    for future in done:
+        index, song, doc = future.result()
+        if doc is None:
+            failed.append((index, song))
+        else:
+            songs[index] = doc
@@ -0,0 +1,212 @@
+"""Module providing an on-disk HTTP response cache for FFR downloads."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+EVICTION_TARGET = 0.9
+
+
+class ResponseCache:  # pylint: disable=too-few-public-methods
+    """
+    Caches successful HTTP responses on local disk so that unchanged charts and
+    playlists are not downloaded again on every refresh.
+
+    Entries are keyed by the request URL without its API key, which identifies
+    the action and level, and point to a body file named after the hash of its
+    content. Responses with an ETag or Last-Modified header are revalidated
+    with If-None-Match and If-Modified-Since, and a 304 response is answered
+    from the cache. Responses without validators are served from the cache
+    until they are older than the TTL. Once the cache grows beyond its size
+    limit, least recently used bodies are evicted together with the entries
+    pointing to them, until it is back under EVICTION_TARGET of the limit.
+
+    Parameters:
+        directory (str): Directory in which cached responses are stored.
+        ttl (float): Seconds during which a response without validators is
+            served from the cache without contacting the server.
+        max_bytes (int): Maximum total size of the cached response bodies and
+            their metadata.
+    """
+
+    def __init__(self, directory: str, ttl: float = 86400, max_bytes: int = 1 << 30) -> None:
+        """
+        Initializes the ResponseCache, creating its directory if needed.
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(
+            entry.stat().st_size for entry in os.scandir(directory)
+            if entry.name.endswith((".body", ".json"))
+        )
+
+    def fetch(
+        self, get: Callable[..., requests.Response], url: str, **kwargs: Any
+    ) -> requests.Response:
+        """
+        Performs a GET request through the cache.
+
+        Args:
+            get (Callable[..., requests.Response]): Function performing the
+                request, such as requests.get or requests.Session.get.
+            url (str): URL of the request.
+            **kwargs: Additional keyword arguments passed to get.
+
+        Returns:
+            requests.Response: The server response, or a response with status
+                code 200 built from the cache when the cached body is still valid.
+        """
+        entry = self._entry(url)
+        content = self._read(entry) if entry is not None else None
+        validators = {}
+        if entry is not None and content is not None:
+            if entry.get("etag"):
+                validators["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                validators["If-Modified-Since"] = entry["last_modified"]
+            if not validators and time.time() - entry["stored_at"] < self.ttl:
+                return self._response(url, content)
+
+        response = get(url, headers={**kwargs.pop("headers", {}), **validators}, **kwargs)
+        if response.status_code == 304 and content is not None:
+            return self._response(url, content, response)
+        if response.status_code == 200:
+            self._store(url, response)
+        return response
+
+    def _key(self, url: str) -> str:
+        """
+        Returns the cache key of a URL, ignoring its API key parameter.
+        """
+        parts = urlsplit(url)
+        query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if k != "key"])
+        return hashlib.sha256(urlunsplit(parts._replace(query=query)).encode()).hexdigest()
+
+    def _path(self, name: str) -> str:
+        """
+        Returns the location of a file within the cache directory.
+        """
+        return os.path.join(self.directory, name)
+
+    def _entry(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the metadata of the cached response for a URL, if its body is
+        still in the cache.
+        """
+        try:
+            with open(self._path(f"{self._key(url)}.json"), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return entry if os.path.exists(self._path(f"{entry['content_hash']}.body")) else None
+
+    def _read(self, entry: Dict[str, Any]) -> Optional[bytes]:
+        """
+        Reads the cached body of an entry, marking it as recently used, or
+        returns None if it was evicted. Reads hold the lock, so that a body is
+        not evicted by another download while it is read.
+        """
+        path = self._path(f"{entry['content_hash']}.body")
+        with self._lock:
+            try:
+                with open(path, "rb") as f:
+                    content = f.read()
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+        return content
+
+    @staticmethod
+    def _response(
+        url: str, content: bytes, response: Optional[requests.Response] = None
+    ) -> requests.Response:
+        """
+        Builds a successful response from a cached body.
+        """
+        if response is None:
+            response = requests.Response()
+            response.url = url
+            response.elapsed = timedelta(0)
+        response.status_code = 200
+        response._content = content  # pylint: disable=protected-access
+        return response
+
+    def _store(self, url: str, response: requests.Response) -> None:
+        """
+        Stores a successful response, then evicts least recently used bodies
+        if the cache exceeds its size limit.
+        """
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        body_path = self._path(f"{content_hash}.body")
+        entry_path = self._path(f"{self._key(url)}.json")
+        entry = json.dumps({
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "stored_at": time.time(),
+            "content_hash": content_hash,
+        }).encode()
+        with self._lock:
+            if not os.path.exists(body_path):
+                self._write(body_path, response.content)
+                self._size += len(response.content)
+            if os.path.exists(entry_path):
+                self._size -= os.path.getsize(entry_path)
+            self._write(entry_path, entry)
+            self._size += len(entry)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """
+        Deletes least recently used bodies, and the entries pointing to them,
+        until the cache is back under EVICTION_TARGET of its size limit, so
+        that evictions scanning the cache directory stay infrequent.
+        """
+        bodies = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self.directory) if entry.name.endswith(".body")
+        )
+        for _, size, path in bodies:
+            if self._size <= self.max_bytes * EVICTION_TARGET:
+                break
+            os.remove(path)
+            self._size -= size
+        self._remove_dangling()
+
+    def _remove_dangling(self) -> None:
+        """
+        Deletes the entries whose body is no longer in the cache.
+        """
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    body_path = self._path(f"{json.load(f)['content_hash']}.body")
+                if os.path.exists(body_path):
+                    continue
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except (OSError, KeyError, json.JSONDecodeError):
+                continue
+            self._size -= size
+
+    @staticmethod
+    def _write(path: str, content: bytes) -> None:
+        """
+        Writes a file atomically, so that readers never see partial content.
+        """
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(content)
+        os.replace(temporary_path, path)
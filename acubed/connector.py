@@ -1,21 +1,63 @@
-"""Module providing connector functions to access data sources."""
+"""Module providing connector functions to access data sources.
 
+requests, pymongo and the NumPy and scikit-learn preprocessing modules are
+imported on first use, so that importing this module, for example in worker
+processes or short-lived tools, stays cheap.
+"""
+# pylint: disable=import-outside-toplevel
+
+import hashlib
 import json
 import logging
+import os
+import random
 import time
-from concurrent.futures import ThreadPoolExecutor
-from operator import itemgetter
-from typing import Dict, Any, List, ValuesView
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import cached_property
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Collection,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    ValuesView,
+)
+
+from acubed import metrics
+
+if TYPE_CHECKING:
+    from multiprocessing.context import BaseContext
 
-import requests
+    import requests
 
-from pymongo import MongoClient
-from pymongo.operations import ReplaceOne
+    from acubed.cache import ResponseCache
+    from acubed.preprocessing import FFRChartTransformer
 
-from acubed.preprocessing import FFRChartTransformer
+FFR_API_URL = "https://www.flashflashrevolution.com/api/api.php"
+FFR_PLAYLIST_URL = "https://www.flashflashrevolution.com/game/r3/r3-playlist.php"
+CHART_FORMATS = ("records", "binary")
+USER_AGENT = " ".join(
+    [
+        "Mozilla/5.0 (Windows NT 6.1; WOW64)",
+        "AppleWebKit/537.36 (KHTML, like Gecko)",
+        "Chrome/56.0.2924.76",
+        "Safari/537.36",
+    ]
+)
 
 
-class FFRDatabaseConnector:
+class FFRDatabaseConnector:  # pylint: disable=too-many-instance-attributes
     """
     Connects to the FFR API via an API key and downloads all public chart data.
 
@@ -25,56 +67,99 @@ class FFRDatabaseConnector:
 
     Parameters:
         config (Dict[str, Any]): Configuration dictionary to access API on FFR.
+            FFR_API_URL and FFR_PLAYLIST_URL may be set to point the connector
+            at another server, such as a local stand-in, and FFR_ERROR_DELAY
+            to change the seconds waited after a server error.
+            FFR_PLAYLIST_CACHE may be set to a file in which the playlist is
+            kept for FFR_PLAYLIST_CACHE_TTL seconds, one day by default.
+        cache (Optional[ResponseCache]): Cache used for the playlist and chart
+            downloads, so that unchanged responses are not downloaded again.
+        chart_format (str): Format in which charts are stored, one of
+            CHART_FORMATS. 'records' stores lists of time and step
+            dictionaries, and 'binary' the compact encoding of
+            acubed.encoding.encode_chart, which MongoDBConnector.encode_charts
+            migrates existing charts to.
+
+    The playlist is fetched on first use of song_list rather than on
+    construction.
     """
 
-    def __init__(self, config: Dict[str, Any]) -> None:
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        cache: Optional["ResponseCache"] = None,
+        chart_format: str = "records",
+    ) -> None:
         """
         Initialize the FFRDatabaseConnector with the given configuration.
         """
+        import requests
+
         self.ffr_api_key = None
-        if "USERNAME" not in config.keys():
-            raise KeyError("Config dictionary parameter must contain username key.")
-        if "FFR_API_KEY" not in config.keys():
-            raise KeyError("Config dictionary parameter must contain FFR_API_KEY key.")
-        for k, v in config.items():
-            setattr(self, k.lower(), v)
+        apply_ffr_config(self, config)
+        self.cache: Optional["ResponseCache"] = cache
+        self.chart_format: str = check_chart_format(chart_format)
 
         self.thread_pool: int = 16
         max_retries: int = 3
         self.session: requests.Session = requests.Session()
-        self.session.mount(
-            "https://",
-            requests.adapters.HTTPAdapter(
-                pool_maxsize=self.thread_pool,
-                max_retries=max_retries,
-                pool_block=True,
-            ),
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=self.thread_pool,
+            max_retries=max_retries,
+            pool_block=True,
         )
-        base_api_url: str = "https://www.flashflashrevolution.com/api/api.php"
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        base_api_url: str = config.get("FFR_API_URL", FFR_API_URL)
         self.api_url: str = f"{base_api_url}?key={self.ffr_api_key}&action={{}}"
+        self.error_delay: float = float(config.get("FFR_ERROR_DELAY", 5))
+
+        self.playlist_url: str = config.get("FFR_PLAYLIST_URL", FFR_PLAYLIST_URL)
+        self.playlist_cache: Optional[str] = config.get("FFR_PLAYLIST_CACHE")
+        self.playlist_cache_ttl: float = float(config.get("FFR_PLAYLIST_CACHE_TTL", 86400))
+        self._song_list: Optional[List[Dict[str, Any]]] = None
+        self.failed_levels: List[Any] = []
+
+    @property
+    def song_list(self) -> List[Dict[str, Any]]:
+        """
+        The songs of the playlist, fetched on first use.
+        """
+        if self._song_list is None:
+            self._song_list = load_playlist(self.playlist_cache, self.playlist_cache_ttl)
+        if self._song_list is None:
+            headers = {"User-Agent": USER_AGENT}
+            with metrics.timer("playlist_seconds"):
+                self._song_list = (
+                    self.cache.fetch(self._download, self.playlist_url, headers=headers, timeout=10)
+                    if self.cache else
+                    self._download(self.playlist_url, headers=headers, timeout=10)
+                ).json()
+            save_playlist(self.playlist_cache, self._song_list)
+        return self._song_list
 
-        self.song_list: List[Dict[str, Any]] = requests.get(
-            "https://www.flashflashrevolution.com/game/r3/r3-playlist.php",
-            headers={
-                "User-Agent": " ".join(
-                    [
-                        "Mozilla/5.0 (Windows NT 6.1; WOW64)",
-                        "AppleWebKit/537.36 (KHTML, like Gecko)",
-                        "Chrome/56.0.2924.76",
-                        "Safari/537.36",
-                    ]
-                )
-            },
-            timeout=10,
-        ).json()
-
-        self.transformer: FFRChartTransformer = FFRChartTransformer()
-
-    def get(self, url: str) -> requests.Response:
+    @song_list.setter
+    def song_list(self, songs: List[Dict[str, Any]]) -> None:
+        """
+        Replaces the songs of the playlist.
+        """
+        self._song_list = songs
+
+    @cached_property
+    def transformer(self) -> "FFRChartTransformer":
+        """
+        The transformer applied to every downloaded chart, created on first use.
+        """
+        from acubed.preprocessing import FFRChartTransformer
+
+        return FFRChartTransformer(output=self.chart_format)
+
+    def get(self, url: str) -> "requests.Response":
         """
         Perform a GET request to the specified URL.
         """
-        response = self.session.get(url)
+        with metrics.timer("fetch_seconds"):
+            response = self.cache.fetch(self._download, url) if self.cache else self._download(url)
         logging.info(
             "request was completed in %s seconds [%s]",
             response.elapsed.total_seconds(),
@@ -87,35 +172,221 @@ class FFRDatabaseConnector:
             )
 
         if 500 <= response.status_code < 600:
-            time.sleep(5)
+            metrics.count("server_errors_total")
+            time.sleep(self.error_delay)
 
         return response
 
-    def download_charts(self) -> Dict[str, Dict[str, Any]]:
+    def _download(self, url: str, **kwargs: Any) -> "requests.Response":
+        """
+        Performs a GET request on the session, counting the bytes downloaded.
+        """
+        response = self.session.get(url, **kwargs)
+        metrics.count("requests_total")
+        metrics.count("bytes_downloaded_total", len(response.content))
+        return response
+
+    def download_charts(
+        self, processes: int = 0, queue_depth: int = 64, retries: int = 3, backoff: float = 1.0
+    ) -> Dict[str, Dict[str, Any]]:
         """
         Downloads chart data for each song in the public engine and
         preprocesses the data.
+
+        Args:
+            processes (int): Number of worker processes that decode and transform
+                downloaded payloads while further downloads are in flight. With 0,
+                payloads are processed on the calling thread.
+            queue_depth (int): Maximum number of downloads in flight, and of
+                payloads waiting to be processed by the worker processes.
+            retries (int): Number of times failed downloads are retried.
+            backoff (float): Base delay in seconds before retrying failed downloads.
+
+        Charts are returned in playlist order, including charts downloaded on
+        a retry.
+        """
+        charts = self.iter_charts(processes, queue_depth, retries=retries, backoff=backoff)
+        return {d["_id"]: d for d in sorted(charts, key=lambda d: d["index"])}
+
+    def iter_charts(
+        self,
+        processes: int = 0,
+        queue_depth: int = 64,
+        retries: int = 3,
+        backoff: float = 1.0,
+        exclude: Collection[Any] = (),
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Downloads and preprocesses chart data like download_charts, but yields
+        each chart as soon as it is ready. At most queue_depth downloads and
+        queue_depth transforms are in flight at any time, so memory use does not
+        grow with the number of songs.
+
+        Songs are first downloaded in playlist order. Songs whose download failed
+        are put in a retry queue, which is downloaded again after an exponential
+        backoff with jitter, up to retries times. Levels that still fail are
+        stored in self.failed_levels. The index field of every chart is its
+        position in the playlist.
+
+        Args:
+            processes (int): Number of worker processes that decode and transform
+                downloaded payloads. With 0, payloads are processed on the
+                calling thread.
+            queue_depth (int): Maximum number of downloads in flight, and of
+                payloads waiting to be processed by the worker processes.
+            retries (int): Number of times failed downloads are retried.
+            backoff (float): Base delay in seconds before retrying failed
+                downloads, doubled on every retry.
+            exclude (Collection[Any]): Levels to skip, such as levels already
+                downloaded before an interrupted refresh.
         """
-        songs: List[Dict[str, Any]] = []
         self.song_list = [
             dict(song, **{"url": self.api_url.format(f"chart&level={song['level']}")})
             for song in self.song_list
         ]
+        queue = [
+            (index, song) for index, song in enumerate(self.song_list)
+            if song["level"] not in exclude
+        ]
+
+        pending: Deque[Tuple[int, Future]] = deque()
+        with ThreadPoolExecutor(max_workers=self.thread_pool) as executor, (
+            ProcessPoolExecutor(max_workers=processes, mp_context=_worker_context())
+            if processes else nullcontext()
+        ) as pool:
+            for attempt in range(retries + 1):
+                if attempt:
+                    _sleep_before_retry(len(queue), backoff * 2 ** (attempt - 1), backoff)
+
+                failed: List[Tuple[int, Dict[str, Any]]] = []
+                for index, song, response in self._iter_responses(executor, queue, queue_depth):
+                    if response is None or response.status_code != 200:
+                        metrics.count("downloads_failed_total")
+                        failed.append((index, song))
+                        continue
+                    if pool is None:
+                        yield dict(
+                            transform_payload(self.transformer, song, response.content),
+                            index=index,
+                        )
+                        continue
+                    pending.append((index, pool.submit(
+                        _transform_in_worker, self.transformer, song, response.content,
+                        metrics.REGISTRY.enabled,
+                    )))
+                    while len(pending) >= queue_depth:
+                        yield _pop_transformed(pending)
 
-        with ThreadPoolExecutor(max_workers=self.thread_pool) as executor:
-            for song, response in zip(
-                self.song_list,
-                executor.map(self.get, map(itemgetter("url"), self.song_list)),
-            ):
-                if response.status_code == 200:
-                    song["chart"] = json.loads(response.content)["chart"]
-                    song = self.transformer.fit_transform(song)
-                    song["chart"] = [note._asdict() for note in song["chart"]]
-                    songs.append(song)
-                else:
+                queue = failed
+                if not queue:
                     break
 
-        return {d["_id"]: dict(d, index=index) for (index, d) in enumerate(songs)}
+            while pending:
+                yield _pop_transformed(pending)
+
+        self.failed_levels = [song["level"] for _, song in queue]
+        if self.failed_levels:
+            logging.error("levels failed permanently: %s", self.failed_levels)
+
+    def _iter_responses(
+        self,
+        executor: ThreadPoolExecutor,
+        queue: List[Tuple[int, Dict[str, Any]]],
+        window: int,
+    ) -> Iterator[Tuple[int, Dict[str, Any], Optional["requests.Response"]]]:
+        """
+        Yields (index, song, response) tuples in the order of the queue while
+        keeping at most window downloads submitted to the executor. The response
+        is None when the request raised an exception.
+        """
+        downloads: Deque[Tuple[int, Dict[str, Any], Future]] = deque()
+        try:
+            for index, song in queue:
+                downloads.append((index, song, executor.submit(self.get, song["url"])))
+                if len(downloads) >= window:
+                    yield self._result(*downloads.popleft())
+            while downloads:
+                yield self._result(*downloads.popleft())
+        finally:
+            for _, _, future in downloads:
+                future.cancel()
+
+    @staticmethod
+    def _result(
+        index: int, song: Dict[str, Any], future: Future
+    ) -> Tuple[int, Dict[str, Any], Optional["requests.Response"]]:
+        """
+        Waits for a download, replacing the response with None if the request
+        raised an exception.
+        """
+        import requests
+
+        try:
+            return index, song, future.result()
+        except requests.RequestException as error:
+            logging.error("request failed, %s [%s]", error, song["url"])
+            return index, song, None
+
+
+def apply_ffr_config(connector: Any, config: Dict[str, Any]) -> None:
+    """
+    Validates a configuration dictionary to access API on FFR and sets its
+    entries as lowercase attributes of the connector.
+    """
+    if "USERNAME" not in config.keys():
+        raise KeyError("Config dictionary parameter must contain username key.")
+    if "FFR_API_KEY" not in config.keys():
+        raise KeyError("Config dictionary parameter must contain FFR_API_KEY key.")
+    for k, v in config.items():
+        setattr(connector, k.lower(), v)
+
+
+def check_chart_format(chart_format: str) -> str:
+    """
+    Returns a chart format after checking that it is one of CHART_FORMATS.
+    """
+    if chart_format not in CHART_FORMATS:
+        raise ValueError(f"Chart format must be one of {list(CHART_FORMATS)}.")
+    return chart_format
+
+
+def load_playlist(path: Optional[str], ttl: float) -> Optional[List[Dict[str, Any]]]:
+    """
+    Returns the playlist stored in a local file, or None if there is no file or
+    it is older than ttl seconds.
+    """
+    if not path or not os.path.exists(path) or time.time() - os.path.getmtime(path) >= ttl:
+        return None
+    with open(path, encoding="utf-8") as f:
+        songs: List[Dict[str, Any]] = json.load(f)
+    logging.info("loaded playlist of %s songs from %s", len(songs), path)
+    return songs
+
+
+def save_playlist(path: Optional[str], songs: List[Dict[str, Any]]) -> None:
+    """
+    Stores a playlist in a local file, if a file is given.
+    """
+    if not path:
+        return
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(songs, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def transform_payload(
+    transformer: "FFRChartTransformer", song: Dict[str, Any], content: bytes
+) -> Dict[str, Any]:
+    """
+    Decodes an action=chart response for the given song and transforms it.
+    Defined at module level so that it can run in worker processes.
+    """
+    from acubed.payload import decode_payload
+
+    with metrics.timer("decode_seconds"):
+        chart = decode_payload(content)
+    with metrics.timer("transform_seconds"):
+        return transformer.fit_transform(dict(song, chart=chart))
 
 
 class MongoDBConnector:
@@ -124,9 +395,14 @@ class MongoDBConnector:
 
     Parameters:
         config (Dict[str, Any]): Configuration dictionary to access database in MongoDB.
+            MONGODB_URI may be set to connect to another deployment, such as a
+            local mongod, instead of the Atlas cluster.
+        client (Any): Client used instead of connecting to the Atlas cluster,
+            such as a MongoClient of a local mongod or an in-memory stand-in.
+            Otherwise a MongoClient is created on first use of client.
     """
 
-    def __init__(self, config: Dict[str, Any]) -> None:
+    def __init__(self, config: Dict[str, Any], client: Optional[Any] = None) -> None:
         """
         Initializes the MongoDBConnector with the provided configuration.
         """
@@ -137,28 +413,289 @@ class MongoDBConnector:
         cluster = "atlascluster.hlpskdz.mongodb.net"
         options = "?retryWrites=true&w=majority"
         conn_string = f"{self.username}:{self.mongodb_password}"
-        self.uri = f"mongodb+srv://{conn_string}@{cluster}/{options}"
+        self.uri = config.get("MONGODB_URI", f"mongodb+srv://{conn_string}@{cluster}/{options}")
+
+        self._client: Any = client
+
+    @property
+    def client(self) -> Any:
+        """
+        The client of the deployment, connected on first use.
+        """
+        if self._client is None:
+            from pymongo import MongoClient
 
-        self.client: Any = MongoClient(self.uri)
+            self._client = MongoClient(self.uri)
+        return self._client
 
-    def upsert(self, data: ValuesView) -> Any:
+    def upsert(
+        self,
+        data: ValuesView,
+        delta: bool = True,
+        chunk_size: int = 1000,
+        workers: int = 4,
+        retries: int = 2,
+    ) -> Any:
         """
         Performs an upsert operation on the MongoDB database.
 
         This operation inserts new documents or updates existing documents based
-        on the provided data.
+        on the provided data. Every document is stored with a content hash of
+        its chart and metadata in the 'hash' field. With delta set, the stored
+        hashes are fetched first and unchanged documents are not written.
+
+        Operations are sent as unordered bulk writes of chunk_size operations,
+        with up to workers chunks in flight through the client's connection
+        pool. Operations that fail are retried on their own, up to retries times.
 
         Args:
             data (List[Dict[str, Any]]): A list of dictionaries, each containing
                 document data. Each dictionary must have an '_id' field used for
                 identifying existing documents.
+            delta (bool): Whether to skip documents whose content is unchanged.
+            chunk_size (int): Number of operations in each bulk write.
+            workers (int): Maximum number of bulk writes in flight.
+            retries (int): Number of times failed operations are retried.
+
+        Returns:
+            Dict[str, Any]: The bulk_api_result of all chunks merged together,
+                where nUpserted counts inserted documents and nMatched updated
+                documents, with the number of unchanged documents added as
+                nSkipped. Operations that still failed are in writeErrors.
         """
-        operations: List[Any] = [
-            ReplaceOne(filter={"_id": doc["_id"]}, replacement=doc, upsert=True)
-            for doc in data
-        ]
-        results = self.client.get_database("ffr").charts.bulk_write(operations)
-        return results.bulk_api_result
+        collection = self.client.get_database("ffr").charts
+        stats = {"nSkipped": 0}
+        operations = _replacements(self._changed(collection, data, delta, stats))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = [
+                (offset, future.result())
+                for offset, future in [
+                    (offset, executor.submit(_write_chunk, collection, chunk, retries))
+                    for offset, chunk in zip(
+                        range(0, len(operations), chunk_size),
+                        _batched(operations, chunk_size),
+                    )
+                ]
+            ]
+        return _log_changes(dict(_merge_bulk_results(results), **stats))
+
+    def upsert_stream(  # pylint: disable=too-many-arguments
+        self,
+        data: Iterable[Dict[str, Any]],
+        batch_size: int = 500,
+        max_pending: int = 2,
+        delta: bool = True,
+        retries: int = 2,
+        *,
+        on_written: Optional[Callable[[List[Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Performs the upsert operation on a stream of documents, flushing them to
+        the MongoDB database in bulk batches as they arrive.
+
+        Batches are written as unordered bulk writes on background threads while
+        the stream is consumed, and at most max_pending batches are buffered or
+        in flight, so memory use does not grow with the number of documents.
+        Operations that fail are retried on their own, up to retries times.
+
+        Args:
+            data (Iterable[Dict[str, Any]]): Documents to upsert, each with an
+                '_id' field used for identifying existing documents.
+            batch_size (int): Number of documents in each bulk write.
+            max_pending (int): Maximum number of batches buffered or in flight.
+            delta (bool): Whether to skip documents whose content is unchanged.
+            retries (int): Number of times failed operations are retried.
+            on_written (Optional[Callable[[List[Any]], None]]): Called with the
+                '_id' of every document once it is stored, after its batch is
+                written or as soon as it is skipped as unchanged. Documents
+                whose operation failed are left out.
+
+        Returns:
+            Dict[str, Any]: The bulk_api_result of all batches merged together,
+                with indices relative to the written documents and the number of
+                unchanged documents added as nSkipped.
+        """
+        collection = self.client.get_database("ffr").charts
+        stats = {"nSkipped": 0}
+        skipped: List[Any] = []
+        results: List[Tuple[int, Dict[str, Any]]] = []
+        pending: Deque[Tuple[int, List[Dict[str, Any]], Future]] = deque()
+        offset = 0
+
+        with ThreadPoolExecutor(max_workers=max_pending) as executor:
+            for batch in _batched(self._changed(collection, data, delta, stats, skipped),
+                                  batch_size):
+                pending.append((offset, batch, executor.submit(
+                    _write_chunk, collection, _replacements(batch), retries
+                )))
+                offset += len(batch)
+                while len(pending) >= max_pending:
+                    results.append(_pop_written(pending, skipped, on_written))
+            while pending:
+                results.append(_pop_written(pending, skipped, on_written))
+        if on_written is not None and skipped:
+            on_written(skipped)
+        return _log_changes(dict(_merge_bulk_results(results), **stats))
+
+    @staticmethod
+    def _changed(
+        collection: Any,
+        data: Iterable[Dict[str, Any]],
+        delta: bool,
+        stats: Dict[str, int],
+        skipped: Optional[List[Any]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Adds a content hash to every document and, with delta set, drops the
+        documents whose stored hash is identical, counting them in stats and
+        adding their '_id' to skipped.
+        """
+        stored = (
+            {doc["_id"]: doc.get("hash") for doc in collection.find({}, {"hash": 1})}
+            if delta else {}
+        )
+        for doc in data:
+            doc = dict(doc, hash=content_hash(doc))
+            if stored.get(doc["_id"]) == doc["hash"]:
+                stats["nSkipped"] += 1
+                if skipped is not None:
+                    skipped.append(doc["_id"])
+                continue
+            yield doc
+
+    def rebuild(
+        self, data: Iterable[Dict[str, Any]], batch_size: int = 1000, max_pending: int = 4
+    ) -> Dict[str, Any]:
+        """
+        Replaces every document of the 'charts' collection with a stream of
+        documents, without readers ever seeing a partially filled collection.
+
+        Documents are hashed like in upsert and inserted into a new staging
+        collection with unordered insert_many batches, with at most max_pending
+        batches buffered or in flight. The indexes of 'charts' are then built on
+        the staging collection, which is atomically renamed over 'charts'. If
+        any step fails, the staging collection is dropped and 'charts' is left
+        untouched.
+
+        Args:
+            data (Iterable[Dict[str, Any]]): Documents to store, each with a
+                unique '_id' field.
+            batch_size (int): Number of documents in each insert_many.
+            max_pending (int): Maximum number of batches buffered or in flight.
+
+        Returns:
+            Dict[str, Any]: The number of documents written as nInserted.
+        """
+        database = self.client.get_database("ffr")
+        staging = database.get_collection(f"charts_staging_{uuid.uuid4().hex}")
+        inserted = 0
+        pending: Deque[Future] = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=max_pending) as executor:
+                docs = (dict(doc, hash=content_hash(doc)) for doc in data)
+                for batch in _batched(docs, batch_size):
+                    pending.append(executor.submit(_insert_batch, staging, batch))
+                    while len(pending) >= max_pending:
+                        inserted += pending.popleft().result()
+                inserted += sum(future.result() for future in pending)
+
+            for name, index in database.charts.index_information().items():
+                if name != "_id_":
+                    options = {k: v for k, v in index.items() if k not in ("key", "v", "ns")}
+                    staging.create_index(index["key"], name=name, **options)
+            staging.rename("charts", dropTarget=True)
+        except BaseException:
+            staging.drop()
+            raise
+
+        logging.info("rebuilt charts collection with %s documents", inserted)
+        return {"nInserted": inserted}
+
+    def iter_charts(
+        self,
+        difficulty: Optional[Union[int, Tuple[int, int]]] = None,
+        levels: Optional[Iterable[Any]] = None,
+        projection: Optional[Iterable[str]] = None,
+        batch_size: int = 100,
+        as_arrays: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterates over the stored charts with a server-side cursor, so that
+        scanning the whole collection holds only one batch of documents in
+        memory at a time.
+
+        Each chart is decoded when its document is reached, from either the
+        binary encoding or lists of time and step dictionaries, into a
+        Stepfile that only creates Note objects on access.
+
+        Args:
+            difficulty (Optional[Union[int, Tuple[int, int]]]): Difficulty of
+                the charts to return, or an inclusive (minimum, maximum) range.
+            levels (Optional[Iterable[Any]]): Levels of the charts to return.
+            projection (Optional[Iterable[str]]): Fields of the documents to
+                return. All fields are returned if omitted.
+            batch_size (int): Number of documents in each cursor batch.
+            as_arrays (bool): Whether to return each chart as a tuple of its
+                (times, steps) columns instead of a Stepfile.
+
+        Returns:
+            Iterator[Dict[str, Any]]: The matching documents, with their
+                charts decoded.
+        """
+        from acubed.encoding import decode_chart
+
+        query: Dict[str, Any] = {}
+        if isinstance(difficulty, tuple):
+            query["difficulty"] = {"$gte": difficulty[0], "$lte": difficulty[1]}
+        elif difficulty is not None:
+            query["difficulty"] = difficulty
+        if levels is not None:
+            query["_id"] = {"$in": list(levels)}
+
+        fields = None if projection is None else {field: 1 for field in projection}
+        cursor = self.client.get_database("ffr").charts.find(
+            query, fields, batch_size=batch_size
+        )
+        with cursor:
+            for doc in cursor:
+                if "chart" in doc:
+                    stepfile = decode_chart(doc["chart"])
+                    doc["chart"] = stepfile.to_arrays() if as_arrays else stepfile
+                yield doc
+
+    def encode_charts(self, batch_size: int = 500, retries: int = 2) -> Dict[str, Any]:
+        """
+        Migrates stored charts from lists of time and step dictionaries to the
+        binary encoding of acubed.encoding.encode_chart, updating their content
+        hash. Charts that are already encoded are left untouched, so the
+        migration can be interrupted and run again.
+
+        Args:
+            batch_size (int): Number of documents in each bulk write.
+            retries (int): Number of times failed operations are retried.
+
+        Returns:
+            Dict[str, Any]: The bulk_api_result of all batches merged together.
+        """
+        from pymongo.operations import UpdateOne
+
+        from acubed.encoding import decode_chart, encode_chart
+
+        collection = self.client.get_database("ffr").charts
+        cursor = collection.find({"chart": {"$type": "array"}}, batch_size=batch_size)
+        results: List[Tuple[int, Dict[str, Any]]] = []
+        for offset, batch in enumerate(_batched(cursor, batch_size)):
+            operations = []
+            for doc in batch:
+                doc["chart"] = encode_chart(decode_chart(doc["chart"]))
+                operations.append(UpdateOne(
+                    {"_id": doc["_id"]},
+                    {"$set": {"chart": doc["chart"], "hash": content_hash(doc)}},
+                ))
+            results.append((offset * batch_size, _write_chunk(collection, operations, retries)))
+        merged = _merge_bulk_results(results)
+        logging.info("encoded %s charts", merged["nModified"])
+        return merged
 
     def reset(self) -> Any:
         """
@@ -166,3 +703,198 @@ class MongoDBConnector:
         """
         results = self.client.get_database("ffr").charts.delete_many({})
         return results
+
+
+def _sleep_before_retry(count: int, delay: float, jitter: float) -> None:
+    """
+    Waits before retrying failed downloads, adding a random jitter of up to
+    jitter seconds to the delay.
+    """
+    delay += random.uniform(0, jitter)
+    logging.warning("retrying %s failed downloads in %.1f seconds", count, delay)
+    time.sleep(delay)
+
+
+def _worker_context() -> "BaseContext":
+    """
+    Returns the context that starts the worker processes of iter_charts. Its
+    download threads are already running when workers start, and forking a
+    multi-threaded process can deadlock, so workers are started by a fork
+    server, or spawned where fork servers are unavailable.
+    """
+    import multiprocessing
+
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _pop_transformed(pending: Deque[Tuple[int, Future]]) -> Dict[str, Any]:
+    """
+    Waits for the oldest transform submitted to the worker processes, observes
+    the timings it recorded and returns its chart with its playlist index.
+    """
+    index, future = pending.popleft()
+    doc, observations = future.result()
+    for name, value in observations:
+        metrics.observe(name, value)
+    return dict(doc, index=index)
+
+
+def _pop_written(
+    pending: Deque[Tuple[int, List[Dict[str, Any]], Future]],
+    skipped: List[Any],
+    on_written: Optional[Callable[[List[Any]], None]],
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Waits for the oldest batch written by upsert_stream and returns its offset
+    and result, passing the '_id' of its stored documents and of the documents
+    skipped so far to on_written.
+    """
+    offset, batch, future = pending.popleft()
+    result = future.result()
+    if on_written is not None:
+        failed = {error["index"] for error in result.get("writeErrors", [])}
+        on_written(skipped + [doc["_id"] for i, doc in enumerate(batch) if i not in failed])
+        skipped.clear()
+    return offset, result
+
+
+def _transform_in_worker(
+    transformer: "FFRChartTransformer", song: Dict[str, Any], content: bytes, record: bool
+) -> Tuple[Dict[str, Any], List[Tuple[str, float]]]:
+    """
+    Runs transform_payload in a worker process, returning its chart together
+    with the timings it observed if record is set.
+    """
+    with metrics.recording(record) as observations:
+        doc = transform_payload(transformer, song, content)
+    return doc, observations
+
+
+def content_hash(doc: Dict[str, Any]) -> str:
+    """
+    Returns a hash of the chart and metadata of a document, ignoring any
+    previously stored hash.
+    """
+    content = {k: v for k, v in doc.items() if k != "hash"}
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, separators=(",", ":"), default=str).encode()
+    ).hexdigest()
+
+
+def _log_changes(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Logs the number of skipped, inserted and updated documents of a write.
+    """
+    logging.info(
+        "skipped %s, inserted %s, updated %s documents",
+        results["nSkipped"],
+        results["nUpserted"],
+        results["nMatched"],
+    )
+    return results
+
+
+def _write_chunk(
+    collection: Any, operations: List[Any], retries: int, backoff: float = 0.5
+) -> Dict[str, Any]:
+    """
+    Performs an unordered bulk write of a chunk of operations, retrying only
+    the operations that failed after an exponential backoff with jitter. A
+    network or server error fails every operation of the attempt, so that it
+    is retried without affecting other chunks. Returns the merged
+    bulk_api_result with indices relative to the chunk, where writeErrors
+    holds the operations that failed on the last attempt.
+    """
+    from pymongo.errors import BulkWriteError, PyMongoError
+
+    results: List[Tuple[int, Dict[str, Any]]] = []
+    indices = list(range(len(operations)))
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1) + random.uniform(0, backoff))
+        try:
+            with metrics.timer("bulk_write_seconds"):
+                result = collection.bulk_write(
+                    [operations[i] for i in indices], ordered=False
+                ).bulk_api_result
+        except BulkWriteError as error:
+            result = error.details
+        except PyMongoError as error:
+            logging.warning("bulk write of %s operations failed, %s", len(indices), error)
+            result = {"writeErrors": [
+                {"index": i, "code": getattr(error, "code", None), "errmsg": str(error)}
+                for i in range(len(indices))
+            ]}
+        metrics.count("documents_written_total",
+                      len(indices) - len(result.get("writeErrors", [])))
+        result = dict(result, **{
+            key: [dict(item, index=indices[item["index"]]) for item in result.get(key, [])]
+            for key in ("writeErrors", "upserted")
+        })
+
+        indices = [item["index"] for item in result["writeErrors"]]
+        if indices and attempt < retries:
+            logging.warning("retrying %s failed write operations", len(indices))
+            result["writeErrors"] = []
+        elif indices:
+            logging.error("%s write operations failed permanently", len(indices))
+        results.append((0, result))
+        if not indices or attempt == retries:
+            break
+    return _merge_bulk_results(results)
+
+
+def _replacements(docs: Iterable[Dict[str, Any]]) -> List[Any]:
+    """
+    Returns the ReplaceOne operations upserting every document by its '_id'.
+    """
+    from pymongo.operations import ReplaceOne
+
+    return [ReplaceOne(filter={"_id": doc["_id"]}, replacement=doc, upsert=True) for doc in docs]
+
+
+def _insert_batch(collection: Any, documents: List[Dict[str, Any]]) -> int:
+    """
+    Inserts a batch of documents with an unordered insert_many, returning the
+    number of documents inserted.
+    """
+    with metrics.timer("bulk_write_seconds"):
+        inserted = len(collection.insert_many(documents, ordered=False).inserted_ids)
+    metrics.count("documents_written_total", inserted)
+    return inserted
+
+
+def _batched(data: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """
+    Splits an iterable into lists of at most size items.
+    """
+    iterator = iter(data)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _merge_bulk_results(results: Iterable[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Merges the bulk_api_result of several bulk writes, given with the offset of
+    their first operation, into a single bulk_api_result-compatible summary.
+    """
+    merged: Dict[str, Any] = {
+        "writeErrors": [],
+        "writeConcernErrors": [],
+        "nInserted": 0,
+        "nUpserted": 0,
+        "nMatched": 0,
+        "nModified": 0,
+        "nRemoved": 0,
+        "upserted": [],
+    }
+    for offset, result in results:
+        for key in ("nInserted", "nUpserted", "nMatched", "nModified", "nRemoved"):
+            merged[key] += result.get(key, 0)
+        for key in ("writeErrors", "upserted"):
+            merged[key].extend(
+                dict(item, index=item["index"] + offset) for item in result.get(key, [])
+            )
+        merged["writeConcernErrors"].extend(result.get("writeConcernErrors", []))
+    return merged
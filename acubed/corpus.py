@@ -0,0 +1,195 @@
+"""Module providing a memory-mapped local corpus of processed charts."""
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+from collections.abc import Mapping
+from functools import cached_property
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from acubed.datatypes import Stepfile
+from acubed.encoding import decode_chart
+
+MAGIC = b"ACUBEDC1"
+ALIGNMENT = 64
+FOOTER = struct.Struct("<Q8s")
+
+
+def export_corpus(path: str, charts: Iterable[Dict[str, Any]]) -> int:
+    """
+    Writes a stream of processed charts into a single corpus file that is
+    opened by ChartCorpus.
+
+    The file holds the concatenated times and steps of every chart, the row
+    offsets of every chart and their levels, followed by a JSON footer with
+    the location of each array. Charts are written as they arrive, so memory
+    use does not grow with the number of notes, and the file is only moved
+    into place once it is complete.
+
+    Args:
+        path (str): Location of the corpus file.
+        charts (Iterable[Dict[str, Any]]): Documents with the level in '_id'
+            and the chart in 'chart', as a Stepfile or in any format accepted
+            by acubed.encoding.decode_chart.
+
+    Returns:
+        int: The number of charts written.
+    """
+    offsets: List[int] = [0]
+    levels: List[int] = []
+    num_receptors, steps_dtype = 4, np.dtype(np.uint8)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f, tempfile.TemporaryFile() as steps_file:
+        for doc in charts:
+            stepfile = doc["chart"]
+            if not isinstance(stepfile, Stepfile):
+                stepfile = decode_chart(stepfile)
+            if not levels:
+                num_receptors, steps_dtype = stepfile.num_receptors, stepfile.steps.dtype
+            elif stepfile.num_receptors != num_receptors:
+                raise ValueError("All charts of a corpus must have the same number of receptors.")
+
+            f.write(stepfile.times.astype("<f8", copy=False).tobytes())
+            steps_file.write(stepfile.steps.astype(steps_dtype.newbyteorder("<")).tobytes())
+            offsets.append(offsets[-1] + len(stepfile.times))
+            levels.append(doc["_id"])
+
+        arrays = {"times": _array_entry(0, np.dtype("<f8"), offsets[-1])}
+        steps_file.seek(0)
+        arrays["steps"] = _array_entry(
+            _align(f), steps_dtype.newbyteorder("<"), offsets[-1])
+        shutil.copyfileobj(steps_file, f)
+        for name, values in (("offsets", offsets), ("levels", levels)):
+            array = np.asarray(values, dtype="<i8")
+            arrays[name] = _array_entry(_align(f), array.dtype, array.size)
+            f.write(array.tobytes())
+
+        _write_footer(f, {"num_receptors": num_receptors, "arrays": arrays})
+    os.replace(temporary_path, path)
+    return len(levels)
+
+
+class ChartCorpus(Mapping):
+    """
+    A read-only mapping from levels to the charts of a corpus file written by
+    export_corpus.
+
+    The arrays of the file are opened with numpy.memmap, so a chart is only
+    read from disk when it is accessed, and is returned as a Stepfile backed
+    by slices of the mapped arrays without copying them. Worker processes that
+    open the same corpus share its pages through the operating system's page
+    cache, and a pickled ChartCorpus reopens the file instead of copying it.
+
+    Parameters:
+        path (str): Location of the corpus file.
+
+    Attributes:
+        num_receptors (int): Number of receptors of every chart, $n$.
+        times (np.memmap): Concatenated timestamps of all charts.
+        steps (np.memmap): Concatenated step bitmasks of all charts.
+        offsets (np.memmap): Row offsets of every chart, starting at 0.
+        levels (np.memmap): Level of the chart in every slot.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens the corpus file and maps its arrays into memory.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            f.seek(-FOOTER.size, os.SEEK_END)
+            length, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a chart corpus.")
+            f.seek(-FOOTER.size - length, os.SEEK_END)
+            footer = json.loads(f.read(length))
+
+        self.num_receptors: int = footer["num_receptors"]
+        self.times, self.steps, self.offsets, self.levels = (
+            self._map(**footer["arrays"][name])
+            for name in ("times", "steps", "offsets", "levels")
+        )
+
+    @cached_property
+    def index(self) -> Dict[int, int]:
+        """
+        Returns the slot of every level in the corpus.
+        """
+        return {level: slot for slot, level in enumerate(self.levels.tolist())}
+
+    def chart(self, slot: int) -> Stepfile:
+        """
+        Returns the chart in a slot of the corpus as a zero-copy Stepfile.
+        """
+        start, end = self.offsets[slot], self.offsets[slot + 1]
+        return Stepfile.from_arrays(self.times[start:end], self.steps[start:end],
+                                    self.num_receptors)
+
+    def _map(self, offset: int, dtype: str, size: int) -> np.ndarray:
+        """
+        Maps an array of the corpus file into memory.
+        """
+        if not size:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=(size,))
+
+    def __getitem__(self, level: Any) -> Stepfile:
+        """
+        Returns the chart of a level as a zero-copy Stepfile.
+        """
+        return self.chart(self.index[level])
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        Iterates over the levels of the corpus in slot order.
+        """
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of charts in the corpus.
+        """
+        return len(self.levels)
+
+    def __reduce__(self) -> Tuple[Any, Tuple[str]]:
+        """
+        Pickles the corpus by its path, so that it is mapped again on loading.
+        """
+        return (type(self), (self.path,))
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the corpus.
+        """
+        return f"ChartCorpus({self.path!r}, charts={len(self)}, notes={len(self.times)})"
+
+
+def _write_footer(f: Any, metadata: Dict[str, Any]) -> None:
+    """
+    Writes the JSON footer of a corpus file, followed by its length and the
+    magic bytes.
+    """
+    footer = json.dumps(metadata).encode()
+    f.write(footer)
+    f.write(FOOTER.pack(len(footer), MAGIC))
+
+
+def _align(f: Any) -> int:
+    """
+    Pads a file with zeros up to the next aligned position and returns it.
+    """
+    position = f.tell()
+    padding = -position % ALIGNMENT
+    f.write(b"\0" * padding)
+    return position + padding
+
+
+def _array_entry(offset: int, dtype: np.dtype, size: int) -> Dict[str, Any]:
+    """
+    Describes the location of an array in the footer of a corpus file.
+    """
+    return {"offset": offset, "dtype": dtype.str, "size": size}
@@ -1,154 +1,668 @@
-"""Module to define customized datatypes in ACubed."""
-
-from typing import List, NamedTuple, cast, Type, Any
-from operator import attrgetter, add
-from itertools import groupby, chain
-from functools import reduce
-import hashlib
-import re
-
-class BaseType(NamedTuple):
-    """
-    Base datatype to define the occurrence of a note event at a specific
-    timestamp.
-    
-    Attributes:
-        time (float): The time at which the event occurs.
-        step (str): A string representing the required keytaps.
-    """
-    time: float
-    step: str
-
-class Note(BaseType):
-    """
-    A class representing the occurrence of a note event at a specific timestamp
-    for any $n-$key vertical scroll rhythm game.
-    
-    This class extends the BaseType to include additional functionality
-    for manipulating and validating note events. It ensures that the timestamp
-    to successfully hit a note is non-negative and the required keytaps belong
-    to a set of valid binary step combinations determined by the number of
-    receptors, $n$.
-    
-    Parameters:
-        time (float): The time at which the note occurs. Must be non-negative.
-        step (str): A binary string representing the required keytaps.
-    """
-    def __new__(cls: Type['Note'], time: float,
-                step: str, num_receptors: int = 4) -> 'Note':
-        """
-        Instantiates the Note class.
-        """
-        cls.num_receptors = num_receptors
-
-        if time < 0:
-            raise ValueError("Time attribute must be non-negative.")
-
-        valid_steps = [f"{i:0{cls.num_receptors}b}"
-                       for i in range(1, pow(2, cls.num_receptors))]
-        if step not in valid_steps:
-            raise ValueError(f"Step attribute must be one of {valid_steps}.")
-
-        return cast(Note, super().__new__(cls, time, step))
-
-    def __getitem__(self, item: Any) -> Any:
-        """
-        Enables indexing to access the time or step directly.
-        """
-        return (self.time, self.step)[item]
-
-    def __add__(self, other: Any = None) -> Any:
-        """
-        Redefine sum to represent the union of the steps for two notes at
-        the same timestamp.
-        """
-        if not isinstance(other, Note):
-            return NotImplemented
-
-        if self.time != other.time:
-            raise ValueError("Cannot add two Notes with different times attributes.")
-
-        if other:
-            if ('1', '1') in zip(self.step, other.step):
-                raise ValueError("Cannot add Notes with overlapping step orientations.")
-            updated_step = f"{int(self.step, 2) + int(other.step, 2):0{self.num_receptors}b}"
-        else:
-            updated_step = self.step
-        return Note(time=self.time, step=updated_step)
-
-    def __radd__(self, other):
-        """
-        Redefine right summation to enable use of sum().
-        """
-        return self if other == 0 else self.__add__(other)
-
-    def __repr__(self) -> str:
-        """
-        Returns a string representation of the note.
-        """
-        return f"Note(time={self.time}, step='{self.step}', num_receptors={self.num_receptors})"
-
-class Stepfile:
-    """
-    A class representing the collection of note events for any $n-$key
-    vertical scroll rhythm game.
-
-    This class performs additional preprocessing to address zero-framer data
-    quality issues and aggregate steps during object instantiation. 
-    
-    Parameters:
-        notes (List[Note]): The list of Note objects within the stepfile.
-    """
-    def __init__(self, notes: List[Note], num_receptors: int = 4) -> None:
-        """
-        Instantiates the Stepfile class.
-        """
-        self.delta = 1e-6
-        self.num_receptors = num_receptors
-        self.notes = self._preprocess(notes)
-        self._steps = reduce(add, map(attrgetter("step"), self.notes))
-
-    def _preprocess(self, notes: List[Note]) -> List[Note]:
-        """
-        Increments timestamps by a negligible amount for zero framers and
-        aggregates steps to create jumps, hands and quads.
-        """
-        _notes = sorted(notes, key=attrgetter("time", "step"))
-        _stepfile = list(
-            chain.from_iterable(
-                [
-                    [Note(time=t + i * self.delta, step=s) for i, _ in enumerate(_)]
-                    for (t, s), _ in groupby(_notes, key=attrgetter("time", "step"))
-                ]
-            )
-        )
-        return list(
-            reduce(add, sublist)
-            for _, sublist in groupby(
-                sorted(_stepfile, key=attrgetter("time")), key=attrgetter("time")
-            )
-        )
-
-    def __getitem__(self, item: Any) -> Any:
-        """
-        Enables note-level indexing to access the note at a specific timestamp.
-        """
-        return self.notes[
-            [
-                int(m.start() / self.num_receptors)
-                for m in re.finditer("1", self._steps)
-            ][item]
-        ]
-
-    def __len__(self) -> int:
-        """
-        Returns the number of notes in the stepfile.
-        """
-        return self._steps.count("1")
-
-    def __repr__(self) -> str:
-        """
-        Returns a string representation of the stepfile.
-        """
-        stepfile_id = hashlib.md5(self._steps.encode('utf-8')).hexdigest()
-        return f"Stepfile(id={stepfile_id}, num_notes={len(self)})"
+"""Module to define customized datatypes in ACubed."""
+
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union, cast, Type, Any
+from operator import attrgetter
+from functools import cached_property, lru_cache
+import hashlib
+import operator
+
+import numpy as np
+
+ZERO_FRAMER_DELTA = 1e-6
+
+class BaseType(NamedTuple):
+    """
+    Base datatype to define the occurrence of a note event at a specific
+    timestamp.
+    
+    Attributes:
+        time (float): The time at which the event occurs.
+        step (str): A string representing the required keytaps.
+    """
+    time: float
+    step: str
+
+class Note(BaseType):
+    """
+    A class representing the occurrence of a note event at a specific timestamp
+    for any $n-$key vertical scroll rhythm game.
+    
+    This class extends the BaseType to include additional functionality
+    for manipulating and validating note events. It ensures that the timestamp
+    to successfully hit a note is non-negative and the required keytaps belong
+    to a set of valid binary step combinations determined by the number of
+    receptors, $n$.
+    
+    Parameters:
+        time (float): The time at which the note occurs. Must be non-negative.
+        step (str): A binary string representing the required keytaps.
+        num_receptors (int): Number of receptors, $n$.
+    """
+    num_receptors: int = 4
+
+    def __new__(cls: Type['Note'], time: float,
+                step: str, num_receptors: int = 4) -> 'Note':
+        """
+        Instantiates the Note class.
+        """
+        if time < 0:
+            raise ValueError("Time attribute must be non-negative.")
+
+        valid_steps = _valid_steps(num_receptors)
+        if step not in valid_steps:
+            raise ValueError(f"Step attribute must be one of {list(valid_steps)}.")
+
+        note = cast(Note, super().__new__(cls, time, step))
+        note.num_receptors = num_receptors
+        return note
+
+    def __getnewargs__(self) -> Tuple[float, str, int]:
+        """
+        Preserves the number of receptors when the note is pickled.
+        """
+        return (self.time, self.step, self.num_receptors)
+
+    def __getitem__(self, item: Any) -> Any:
+        """
+        Enables indexing to access the time or step directly.
+        """
+        return (self.time, self.step)[item]
+
+    def __add__(self, other: Any = None) -> Any:
+        """
+        Redefine sum to represent the union of the steps for two notes at
+        the same timestamp.
+        """
+        if not isinstance(other, Note):
+            return NotImplemented
+
+        if self.time != other.time:
+            raise ValueError("Cannot add two Notes with different times attributes.")
+
+        if other:
+            if ('1', '1') in zip(self.step, other.step):
+                raise ValueError("Cannot add Notes with overlapping step orientations.")
+            updated_step = f"{int(self.step, 2) + int(other.step, 2):0{self.num_receptors}b}"
+        else:
+            updated_step = self.step
+        return Note(time=self.time, step=updated_step, num_receptors=self.num_receptors)
+
+    def __radd__(self, other):
+        """
+        Redefine right summation to enable use of sum().
+        """
+        return self if other == 0 else self.__add__(other)
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the note.
+        """
+        return f"Note(time={self.time}, step='{self.step}', num_receptors={self.num_receptors})"
+
+class CompactNote:
+    """
+    A memory-efficient variant of Note which stores the required keytaps as
+    an integer bitmask, where the leftmost receptor is the most significant bit.
+
+    Validation uses tables built once per number of receptors, and adding two
+    CompactNote objects is a single bitwise operation. The binary string form
+    remains available through the step attribute for compatibility with Note.
+
+    Parameters:
+        time (float): The time at which the note occurs. Must be non-negative.
+        step (Union[str, int]): A binary string or bitmask representing the
+            required keytaps.
+        num_receptors (int): Number of receptors, $n$.
+    """
+    __slots__ = ("time", "mask", "num_receptors")
+
+    def __init__(self, time: float, step: Union[str, int], num_receptors: int = 4) -> None:
+        """
+        Instantiates the CompactNote class.
+        """
+        if time < 0:
+            raise ValueError("Time attribute must be non-negative.")
+
+        valid_steps = _valid_steps(num_receptors)
+        if isinstance(step, str):
+            if step not in valid_steps:
+                raise ValueError(f"Step attribute must be one of {list(valid_steps)}.")
+            step = valid_steps[step]
+        elif not 0 < step < pow(2, num_receptors):
+            raise ValueError(f"Step attribute must be one of {list(valid_steps)}.")
+
+        self.time = time
+        self.mask = int(step)
+        self.num_receptors = num_receptors
+
+    @property
+    def step(self) -> str:
+        """
+        Returns the binary string representing the required keytaps.
+        """
+        return f"{self.mask:0{self.num_receptors}b}"
+
+    def to_note(self) -> Note:
+        """
+        Converts the compact note to an equivalent Note.
+        """
+        return Note(time=self.time, step=self.step, num_receptors=self.num_receptors)
+
+    def _asdict(self) -> Dict[str, Any]:
+        """
+        Returns the note as a dictionary, matching Note._asdict().
+        """
+        return {"time": self.time, "step": self.step}
+
+    def __getitem__(self, item: Any) -> Any:
+        """
+        Enables indexing to access the time or step directly.
+        """
+        return (self.time, self.step)[item]
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Enables unpacking into time and step, matching Note.
+        """
+        return iter((self.time, self.step))
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Compares the time and step of two notes.
+        """
+        if isinstance(other, CompactNote):
+            return (self.time, self.mask, self.num_receptors) == \
+                (other.time, other.mask, other.num_receptors)
+        if isinstance(other, tuple):
+            return (self.time, self.step) == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        """
+        Hashes the note consistently with Note.
+        """
+        return hash((self.time, self.step))
+
+    def __add__(self, other: Any = None) -> Any:
+        """
+        Redefine sum to represent the union of the steps for two notes at
+        the same timestamp.
+        """
+        if not isinstance(other, CompactNote):
+            return NotImplemented
+
+        if self.time != other.time:
+            raise ValueError("Cannot add two Notes with different times attributes.")
+
+        if self.mask & other.mask:
+            raise ValueError("Cannot add Notes with overlapping step orientations.")
+        return CompactNote(time=self.time, step=self.mask | other.mask,
+                           num_receptors=self.num_receptors)
+
+    def __radd__(self, other):
+        """
+        Redefine right summation to enable use of sum().
+        """
+        return self if other == 0 else self.__add__(other)
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the note.
+        """
+        return (f"CompactNote(time={self.time}, step='{self.step}', "
+                f"num_receptors={self.num_receptors})")
+
+class Stepfile:
+    """
+    A class representing the collection of note events for any $n-$key
+    vertical scroll rhythm game.
+
+    This class performs additional preprocessing to address zero-framer data
+    quality issues and aggregate steps during object instantiation. Note events
+    are stored in columnar form, and Note objects are only created on access.
+
+    Parameters:
+        notes (List[Note]): The list of Note or CompactNote objects within
+            the stepfile.
+
+    Attributes:
+        times (np.ndarray): Sorted float64 timestamps of every note event.
+        steps (np.ndarray): Unsigned integer bitmasks of the required keytaps,
+            where the leftmost receptor is the most significant bit.
+    """
+    def __init__(self, notes: List[Note], num_receptors: int = 4) -> None:
+        """
+        Instantiates the Stepfile class.
+        """
+        self.delta = ZERO_FRAMER_DELTA
+        self.num_receptors = num_receptors
+        self.times, self.steps = self._preprocess(
+            np.fromiter(map(attrgetter("time"), notes), dtype=np.float64, count=len(notes)),
+            np.fromiter((getattr(note, "mask", None) or int(note.step, 2) for note in notes),
+                        dtype=_step_dtype(num_receptors), count=len(notes)),
+        )
+
+    @classmethod
+    def from_arrays(cls, times: Any, steps: Any, num_receptors: int = 4,
+                    preprocess: bool = False) -> 'Stepfile':
+        """
+        Instantiates a Stepfile directly from its columns without creating any
+        Note objects. Unless preprocess is set, the columns are expected to be
+        preprocessed already, as returned by to_arrays().
+
+        Args:
+            times (np.ndarray): Sorted, unique and non-negative timestamps.
+            steps (np.ndarray): Step bitmasks aligned with times.
+            num_receptors (int): Number of receptors, $n$.
+            preprocess (bool): Whether to validate the raw columns, remove
+                zero-framers and aggregate steps as done for Note lists.
+
+        Returns:
+            Stepfile: A stepfile backed by the given columns.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        steps = np.asarray(steps)
+        if times.shape != steps.shape or times.ndim != 1:
+            raise ValueError("Times and steps must be one-dimensional arrays of equal length.")
+
+        stepfile = cls.__new__(cls)
+        stepfile.delta = ZERO_FRAMER_DELTA
+        stepfile.num_receptors = num_receptors
+        if preprocess:
+            _validate_columns(times, steps, num_receptors)
+            stepfile.times, stepfile.steps = stepfile._preprocess(
+                times, steps.astype(_step_dtype(num_receptors)))
+        else:
+            stepfile.times = times
+            stepfile.steps = steps.astype(_step_dtype(num_receptors), copy=False)
+        return stepfile
+
+    @classmethod
+    def from_ragged(cls, times: Any, steps: Any, offsets: Any, num_receptors: int = 4,
+                    preprocess: bool = False) -> List['Stepfile']:
+        """
+        Instantiates one Stepfile per chart from columns of many concatenated
+        charts, where chart i occupies rows offsets[i] up to offsets[i + 1].
+        Preprocessing runs in a single vectorized pass over all charts, and
+        each Stepfile is backed by a slice of the shared result columns.
+
+        Args:
+            times (np.ndarray): Concatenated timestamps of all charts.
+            steps (np.ndarray): Concatenated step bitmasks of all charts.
+            offsets (np.ndarray): Row offsets of every chart, starting at 0 and
+                ending at the total number of rows.
+            num_receptors (int): Number of receptors, $n$.
+            preprocess (bool): Whether to validate the raw columns, remove
+                zero-framers and aggregate steps within each chart.
+
+        Returns:
+            List[Stepfile]: One stepfile per chart, in order.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        steps = np.asarray(steps)
+        offsets = np.asarray(offsets, dtype=np.intp)
+        if times.shape != steps.shape or times.ndim != 1:
+            raise ValueError("Times and steps must be one-dimensional arrays of equal length.")
+        if offsets[0] != 0 or offsets[-1] != times.size or np.any(np.diff(offsets) < 0):
+            raise ValueError("Offsets must increase from 0 to the number of rows.")
+
+        steps = steps.astype(_step_dtype(num_receptors), copy=False)
+        if preprocess:
+            _validate_columns(times, steps, num_receptors)
+            segments = np.repeat(np.arange(offsets.size - 1), np.diff(offsets))
+            times, steps, segments = _preprocess_segments(
+                times, steps, segments, ZERO_FRAMER_DELTA)
+            offsets = np.searchsorted(segments, np.arange(offsets.size))
+        return [cls.from_arrays(times[start:end], steps[start:end], num_receptors)
+                for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def to_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the (times, steps) columns of the stepfile.
+        """
+        return self.times, self.steps
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        Returns the stepfile as a list of dictionaries with time and step keys,
+        matching Note._asdict(), without creating any Note objects.
+        """
+        digits = self._bits() + np.uint8(ord("0"))
+        steps = digits.view(f"S{self.num_receptors}").ravel().astype(str).tolist()
+        return [{"time": t, "step": s} for t, s in zip(self.times.tolist(), steps)]
+
+    def to_grid(self, fps: float = 60, dtype: Any = np.int8,
+                num_frames: Optional[int] = None) -> np.ndarray:
+        """
+        Returns the stepfile as a dense (num_frames, num_receptors) grid, where
+        timestamps are quantized to the nearest frame at the given frame rate
+        and steps falling on the same frame are merged.
+
+        Args:
+            fps (float): Number of frames per second.
+            dtype (Any): Data type of the grid, such as np.int8 or bool.
+            num_frames (Optional[int]): Number of frames of the grid. Steps
+                beyond it are dropped. Defaults to just past the last step.
+
+        Returns:
+            np.ndarray: The grid, with 1 where a receptor is pressed.
+        """
+        return self.pad_grids([self], fps, dtype, num_frames)[0][0]
+
+    def iter_grid_windows(self, length: int, stride: Optional[int] = None, fps: float = 60,
+                          dtype: Any = np.int8) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yields the grid of to_grid in fixed-length windows, without building the
+        grid of the whole stepfile. Windows overlap when stride is smaller than
+        length, and the last window is padded with zeros.
+
+        Args:
+            length (int): Number of frames in each window.
+            stride (Optional[int]): Number of frames between the starts of
+                consecutive windows. Defaults to length.
+            fps (float): Number of frames per second.
+            dtype (Any): Data type of the windows, such as np.int8 or bool.
+
+        Returns:
+            Iterator[Tuple[int, np.ndarray]]: The first frame of every window
+                and its (length, num_receptors) grid.
+        """
+        stride = length if stride is None else stride
+        frames = _frames(self.times, fps)
+        if not frames.size:
+            return
+        for start in range(0, max(int(frames[-1]) + 1 - length, 0) + stride, stride):
+            lo, hi = np.searchsorted(frames, [start, start + length], side="left")
+            bits = unpack_steps(self.steps[lo:hi], self.num_receptors)
+            rows, receptors = np.nonzero(bits)
+            window = np.zeros((length, self.num_receptors), dtype=dtype)
+            window[frames[lo:hi][rows] - start, receptors] = 1
+            yield start, window
+
+    @staticmethod
+    def pad_grids(stepfiles: List['Stepfile'], fps: float = 60, dtype: Any = np.int8,
+                  num_frames: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the grids of to_grid for many stepfiles, padded with zeros to a
+        common number of frames, together with a mask of the frames that lie
+        within each stepfile. All grids are filled in a single vectorized pass.
+
+        Args:
+            stepfiles (List[Stepfile]): Stepfiles with the same number of
+                receptors.
+            fps (float): Number of frames per second.
+            dtype (Any): Data type of the grids, such as np.int8 or bool.
+            num_frames (Optional[int]): Number of frames of every grid. Longer
+                stepfiles are truncated. Defaults to the longest stepfile.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The (num_stepfiles, num_frames,
+                num_receptors) grids and the (num_stepfiles, num_frames) mask.
+        """
+        num_receptors = {stepfile.num_receptors for stepfile in stepfiles}
+        if len(num_receptors) > 1:
+            raise ValueError("All stepfiles must have the same number of receptors.")
+        frames = [_frames(stepfile.times, fps) for stepfile in stepfiles]
+        lengths = np.array([int(f[-1]) + 1 if f.size else 0 for f in frames], dtype=np.intp)
+        if num_frames is None:
+            num_frames = max(lengths.tolist(), default=0)
+
+        receptors = num_receptors.pop() if num_receptors else 4
+        grids = np.zeros((len(stepfiles), num_frames, receptors), dtype=dtype)
+        if stepfiles:
+            _fill_grids(grids, stepfiles, frames)
+        return grids, np.arange(num_frames) < lengths[:, None]
+
+    @property
+    def notes(self) -> List[Note]:
+        """
+        Materializes the stepfile as a list of Note objects.
+        """
+        return [self._note(i) for i in range(len(self.times))]
+
+    def _preprocess(self, times: np.ndarray,
+                    steps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Increments timestamps by a negligible amount for zero framers and
+        aggregates steps to create jumps, hands and quads.
+        """
+        times, steps, _ = _preprocess_segments(
+            times, steps, np.zeros(times.size, dtype=np.intp), self.delta)
+        return times, steps
+
+    def _note(self, row: int) -> Note:
+        """
+        Creates the Note object stored at the given row of the columns.
+        """
+        return Note(time=float(self.times[row]),
+                    step=f"{int(self.steps[row]):0{self.num_receptors}b}",
+                    num_receptors=self.num_receptors)
+
+    def _bits(self) -> np.ndarray:
+        """
+        Unpacks the step bitmasks into a (num_rows, num_receptors) matrix of 0s and 1s.
+        """
+        return unpack_steps(self.steps, self.num_receptors)
+
+    def _counts(self) -> np.ndarray:
+        """
+        Returns the number of keytaps required by each row of the columns.
+        """
+        return self._bits().sum(axis=1, dtype=np.intp)
+
+    @cached_property
+    def _offsets(self) -> np.ndarray:
+        """
+        Prefix counts of keytaps, where rows[i] holds note-level indices
+        _offsets[i] up to (excluding) _offsets[i + 1].
+        """
+        return np.concatenate(([0], np.cumsum(self._counts())))
+
+    def between(self, start: float, end: float) -> 'StepfileView':
+        """
+        Returns a view of all notes with timestamps in the half-open interval
+        [start, end).
+        """
+        lo, hi = np.searchsorted(self.times, [start, end], side="left")
+        return StepfileView(self, range(int(self._offsets[lo]), int(self._offsets[hi])))
+
+    def __getitem__(self, item: Any) -> Any:
+        """
+        Enables note-level indexing to access the note at a specific timestamp.
+        Slices return a lightweight StepfileView over the same columns.
+        """
+        if isinstance(item, slice):
+            return StepfileView(self, range(len(self))[item])
+        index = operator.index(item)
+        num_notes = len(self)
+        if index < 0:
+            index += num_notes
+        if not 0 <= index < num_notes:
+            raise IndexError("Stepfile index out of range.")
+        return self._note(int(np.searchsorted(self._offsets, index, side="right")) - 1)
+
+    def __iter__(self) -> Iterator[Note]:
+        """
+        Iterates over all notes, yielding chords once per required keytap.
+        """
+        for row, count in enumerate(self._counts()):
+            note = self._note(row)
+            for _ in range(count):
+                yield note
+
+    def __len__(self) -> int:
+        """
+        Returns the number of notes in the stepfile.
+        """
+        return int(self._offsets[-1])
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the stepfile.
+        """
+        stepfile_id = hashlib.md5((self._bits() + ord("0")).tobytes()).hexdigest()
+        return f"Stepfile(id={stepfile_id}, num_notes={len(self)})"
+
+
+class StepfileView:
+    """
+    A lightweight, read-only view over a range of note-level indices of a
+    Stepfile. No columns are copied when a view is created.
+
+    Parameters:
+        stepfile (Stepfile): The stepfile being viewed.
+        indices (range): The note-level indices included in the view.
+    """
+    def __init__(self, stepfile: Stepfile, indices: range) -> None:
+        """
+        Instantiates the StepfileView class.
+        """
+        self.stepfile = stepfile
+        self.indices = indices
+
+    def __getitem__(self, item: Any) -> Any:
+        """
+        Enables note-level indexing relative to the start of the view.
+        """
+        if isinstance(item, slice):
+            return StepfileView(self.stepfile, self.indices[item])
+        return self.stepfile[self.indices[item]]
+
+    def __iter__(self) -> Iterator[Note]:
+        """
+        Iterates over all notes within the view.
+        """
+        return map(self.stepfile.__getitem__, self.indices)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of notes within the view.
+        """
+        return len(self.indices)
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the view.
+        """
+        return (f"StepfileView(stepfile={self.stepfile!r}, start={self.indices.start}, "
+                f"stop={self.indices.stop}, step={self.indices.step})")
+
+
+def unpack_steps(steps: np.ndarray, num_receptors: int) -> np.ndarray:
+    """
+    Unpacks step bitmasks into a (num_rows, num_receptors) matrix of 0s and 1s,
+    where column 0 is the leftmost receptor.
+
+    Args:
+        steps (np.ndarray): Step bitmasks, such as the steps column of a
+            Stepfile.
+        num_receptors (int): Number of receptors, $n$.
+
+    Returns:
+        np.ndarray: The uint8 matrix of the receptors pressed by every step.
+    """
+    shifts = np.arange(num_receptors - 1, -1, -1, dtype=steps.dtype)
+    return ((steps[:, None] >> shifts) & 1).astype(np.uint8)
+
+
+def _preprocess_segments(times: np.ndarray, steps: np.ndarray, segments: np.ndarray,
+                         delta: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Increments timestamps by a negligible amount for zero framers and
+    aggregates steps to create jumps, hands and quads, independently within
+    each segment (chart) of the concatenated columns.
+    """
+    if not times.size:
+        return times, steps, segments
+
+    # The k-th duplicate of a (time, step) pair is moved to time + k * delta.
+    order = _sort_order(times, segments)
+    times, steps, segments = times[order], steps[order], segments[order]
+    ties = np.cumsum(_boundaries(times, segments))
+    order = np.lexsort((steps, ties))
+    times, steps, ties = times[order], steps[order], ties[order]
+    run_starts = _boundaries(times, ties) | np.concatenate(([True], steps[1:] != steps[:-1]))
+    positions = np.arange(times.size)
+    ranks = positions - np.maximum.accumulate(np.where(run_starts, positions, 0))
+    times = times + ranks * delta
+    segments = segments[order]
+
+    # Steps sharing a timestamp are merged into a single chord.
+    order = _sort_order(times, segments)
+    times, steps, segments = times[order], steps[order], segments[order]
+    starts = np.flatnonzero(_boundaries(times, segments))
+    chords = np.bitwise_or.reduceat(steps, starts)
+    # The sum of the bitmasks only equals their union when no steps overlap.
+    if np.any(np.add.reduceat(steps.astype(np.uint64), starts) != chords):
+        raise ValueError("Cannot add Notes with overlapping step orientations.")
+    return times[starts], chords, segments[starts]
+
+
+def _boundaries(times: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """
+    Flags the rows which start a new run of equal (segment, time) pairs.
+    """
+    return np.concatenate(([True], (times[1:] != times[:-1]) | (segments[1:] != segments[:-1])))
+
+
+def _sort_order(times: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """
+    Returns the stable order sorting rows by time within each contiguous
+    segment. Charts usually arrive in time order, so only the segments that
+    are out of order are sorted.
+    """
+    order = np.arange(times.size)
+    descending = (segments[1:] == segments[:-1]) & (times[1:] < times[:-1])
+    if np.any(descending):
+        rows = order[np.isin(segments, segments[1:][descending])]
+        order[rows] = rows[np.lexsort((times[rows], segments[rows]))]
+    return order
+
+
+def _frames(times: np.ndarray, fps: float) -> np.ndarray:
+    """
+    Returns the nearest frame of every timestamp at the given frame rate.
+    """
+    return np.rint(times * fps).astype(np.intp)
+
+
+def _fill_grids(grids: np.ndarray, stepfiles: List['Stepfile'], frames: List[np.ndarray]) -> None:
+    """
+    Sets the receptors pressed by every stepfile in its grid, given the frame
+    of each of its rows, skipping frames beyond the end of the grids.
+    """
+    steps = np.concatenate([stepfile.steps for stepfile in stepfiles])
+    bits = unpack_steps(steps, grids.shape[2])
+    charts = np.repeat(np.arange(len(stepfiles)), [f.size for f in frames])
+    rows, columns = np.nonzero(bits)
+    frame = np.concatenate(frames)[rows]
+    keep = frame < grids.shape[1]
+    grids[charts[rows][keep], frame[keep], columns[keep]] = 1
+
+
+def _validate_columns(times: np.ndarray, steps: np.ndarray, num_receptors: int) -> None:
+    """
+    Applies the Note validation rules to whole columns at once.
+    """
+    if np.any(times < 0):
+        raise ValueError("Time attribute must be non-negative.")
+    if np.any((steps < 1) | (steps > pow(2, num_receptors) - 1)):
+        raise ValueError(f"Step attribute must be one of {list(_valid_steps(num_receptors))}.")
+
+
+@lru_cache(maxsize=None)
+def _valid_steps(num_receptors: int) -> Dict[str, int]:
+    """
+    Returns the table of valid binary step strings and their bitmasks for the
+    given number of receptors. The table is built once per receptor count.
+    """
+    return {f"{i:0{num_receptors}b}": i for i in range(1, pow(2, num_receptors))}
+
+
+def _step_dtype(num_receptors: int) -> np.dtype:
+    """
+    Returns the smallest unsigned integer dtype that packs one bit per receptor.
+    """
+    if not 0 < num_receptors <= 64:
+        raise ValueError("Number of receptors must be between 1 and 64.")
+    return np.min_scalar_type(pow(2, num_receptors) - 1)
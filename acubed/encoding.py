@@ -0,0 +1,86 @@
+"""Module providing a compact binary encoding of charts for storage and transfer."""
+
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+from acubed.datatypes import ZERO_FRAMER_DELTA, Stepfile
+
+
+def encode_chart(stepfile: Stepfile) -> Dict[str, Any]:
+    """
+    Encodes a stepfile as a dictionary of binary columns, which are stored as
+    BSON binary values by MongoDB.
+
+    Times are converted to integer microseconds, which keeps the zero-framer
+    offsets, and stored as the differences between consecutive notes in the
+    smallest unsigned integer type that holds them. Decoding recomputes each
+    timestamp the way FFRChartTransformer does, as milliseconds / 1000 plus
+    the zero-framer offset. If that does not reproduce exactly the same float
+    timestamps, they are stored as raw float64 values instead. Steps are stored as their bitmasks,
+    one byte per note for up to 8 receptors.
+
+    Args:
+        stepfile (Stepfile): The stepfile to encode.
+
+    Returns:
+        Dict[str, Any]: The encoded chart, decoded by decode_chart.
+    """
+    times, steps = stepfile.to_arrays()
+    microseconds = np.rint(times * 1e6).astype(np.int64)
+    if np.array_equal(_from_microseconds(microseconds), times):
+        encoding = "delta-us"
+        deltas = np.diff(microseconds, prepend=0)
+        times = deltas.astype(np.min_scalar_type(deltas.max(initial=0)))
+    else:
+        encoding = "raw"
+    times = times.astype(times.dtype.newbyteorder("<"), copy=False)
+    steps = steps.astype(steps.dtype.newbyteorder("<"), copy=False)
+    return {
+        "num_receptors": stepfile.num_receptors,
+        "times_encoding": encoding,
+        "times_dtype": times.dtype.str,
+        "times": times.tobytes(),
+        "steps_dtype": steps.dtype.str,
+        "steps": steps.tobytes(),
+    }
+
+
+def decode_chart(chart: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Stepfile:
+    """
+    Decodes a chart stored by MongoDB into a Stepfile, without creating any
+    Note objects. Both binary charts produced by encode_chart and lists of
+    time and step dictionaries produced by Note._asdict() are accepted.
+
+    Args:
+        chart (Union[Dict[str, Any], List[Dict[str, Any]]]): The stored chart.
+
+    Returns:
+        Stepfile: A stepfile identical to the one that was stored.
+    """
+    if not isinstance(chart, dict):
+        return Stepfile.from_arrays(
+            np.fromiter((r["time"] for r in chart), dtype=np.float64, count=len(chart)),
+            np.fromiter((int(r["step"], 2) for r in chart), dtype=np.uint64, count=len(chart)),
+            num_receptors=len(chart[0]["step"]) if chart else 4,
+        )
+
+    times = np.frombuffer(chart["times"], dtype=chart["times_dtype"])
+    if chart["times_encoding"] == "delta-us":
+        times = _from_microseconds(np.cumsum(times, dtype=np.int64))
+    elif chart["times_encoding"] != "raw":
+        raise ValueError(f"Unknown time encoding {chart['times_encoding']!r}.")
+    return Stepfile.from_arrays(
+        times,
+        np.frombuffer(chart["steps"], dtype=chart["steps_dtype"]),
+        num_receptors=chart["num_receptors"],
+    )
+
+
+def _from_microseconds(microseconds: np.ndarray) -> np.ndarray:
+    """
+    Converts integer microseconds to timestamps in seconds, splitting them into
+    milliseconds and zero-framer offsets like the timestamps of FFR charts.
+    """
+    milliseconds, ranks = np.divmod(microseconds, 1000)
+    return milliseconds / 1000. + ranks * ZERO_FRAMER_DELTA
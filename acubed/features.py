@@ -0,0 +1,211 @@
+"""Module providing vectorized difficulty features of stepfiles."""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from acubed.datatypes import Stepfile, unpack_steps
+from acubed.encoding import decode_chart
+
+
+def rolling_nps(times: np.ndarray, counts: np.ndarray, window: float) -> np.ndarray:
+    """
+    Returns the notes per second within the window starting at every step,
+    where counts holds the number of keytaps of every step.
+    """
+    totals = np.concatenate(([0], np.cumsum(counts)))
+    ends = np.searchsorted(times, times + window, side="left")
+    return (totals[ends] - totals[:-1]) / window
+
+
+def jack_intervals(times: np.ndarray, columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the intervals between consecutive steps on the same receptor,
+    together with the receptor of every interval.
+
+    Times are rounded to the millisecond first, which undoes the offsets of
+    zero-framers, and the zero intervals between their duplicate steps are
+    left out.
+    """
+    receptors, rows = np.nonzero(columns.T)
+    intervals = np.diff(np.round(times[rows], 3))
+    jacks = (receptors[1:] == receptors[:-1]) & (intervals > 0)
+    return intervals[jacks], receptors[1:][jacks]
+
+
+def run_lengths(times: np.ndarray, counts: np.ndarray,
+                stream_gap: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Splits the steps into runs where consecutive steps are at most stream_gap
+    seconds apart, and returns the number of steps in every run together with
+    whether the run contains any chords.
+    """
+    if not times.size:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=bool)
+    runs = np.concatenate(([0], np.cumsum(np.diff(times) > stream_gap)))
+    lengths = np.bincount(runs)
+    chords = np.bincount(runs, weights=counts > 1) > 0
+    return lengths, chords
+
+
+def extract_features(stepfile: Stepfile, windows: Sequence[float] = (1.0, 5.0, 10.0),
+                     stream_gap: float = 0.15) -> Dict[str, float]:
+    """
+    Computes difficulty features of a stepfile from its time and step arrays,
+    in time linear in its number of steps.
+
+    Args:
+        stepfile (Stepfile): The stepfile to describe.
+        windows (Sequence[float]): Lengths in seconds of the rolling windows
+            over which notes per second are measured.
+        stream_gap (float): Maximum number of seconds between consecutive
+            steps of a stream.
+
+    Returns:
+        Dict[str, float]: The features, in the order of feature_names.
+    """
+    times, steps = stepfile.to_arrays()
+    columns = unpack_steps(steps, stepfile.num_receptors)
+    counts = columns.sum(axis=1)
+    notes = float(counts.sum())
+    duration = float(times[-1] - times[0]) if times.size else 0.
+    rows = max(len(counts), 1)
+    features = {
+        "notes": notes,
+        "duration": duration,
+        "nps": notes / duration if duration else 0.,
+    }
+
+    features.update(_nps_features(times, counts, windows))
+    features.update(_jack_features(times, columns))
+
+    features["keys_per_step"] = notes / rows
+    features["jump_fraction"] = float(np.count_nonzero(counts == 2)) / rows
+    features["hand_fraction"] = float(np.count_nonzero(counts == 3)) / rows
+    features["quad_fraction"] = float(np.count_nonzero(counts >= 4)) / rows
+
+    lengths, chords = run_lengths(times, counts, stream_gap)
+    for name, runs in (("stream", lengths[~chords & (lengths > 1)]),
+                       ("jumpstream", lengths[chords & (lengths > 1)])):
+        features[f"{name}_max"] = float(runs.max(initial=0))
+        features[f"{name}_mean"] = float(runs.mean()) if runs.size else 0.
+        features[f"{name}_fraction"] = float(runs.sum()) / rows
+    return features
+
+
+def _nps_features(times: np.ndarray, counts: np.ndarray,
+                  windows: Sequence[float]) -> Dict[str, float]:
+    """
+    Returns the mean, 95th percentile and peak notes per second over rolling
+    windows of every length.
+    """
+    features = {}
+    for window in windows:
+        nps = rolling_nps(times, counts, window) if times.size else np.zeros(1)
+        features[f"nps_{window:g}s_mean"] = float(nps.mean())
+        features[f"nps_{window:g}s_p95"] = float(np.percentile(nps, 95))
+        features[f"nps_{window:g}s_peak"] = float(nps.max())
+    return features
+
+
+def _jack_features(times: np.ndarray, columns: np.ndarray) -> Dict[str, float]:
+    """
+    Returns the peak and median jack rates in steps per second, over all
+    receptors and for every receptor, where receptor 0 is the leftmost.
+    """
+    intervals, receptors = jack_intervals(times, columns)
+    features = {}
+    for suffix, jacks in [("", intervals)] + [
+            (f"_r{receptor}", intervals[receptors == receptor])
+            for receptor in range(columns.shape[1])]:
+        features[f"jack_rate_peak{suffix}"] = 1 / float(jacks.min()) if jacks.size else 0.
+        features[f"jack_rate_median{suffix}"] = (1 / float(np.median(jacks))
+                                                 if jacks.size else 0.)
+    return features
+
+
+def feature_names(windows: Sequence[float] = (1.0, 5.0, 10.0),
+                  num_receptors: int = 4) -> List[str]:
+    """
+    Returns the names of the features computed by extract_features for
+    stepfiles with num_receptors receptors.
+    """
+    stepfile = Stepfile.from_arrays([], [], num_receptors=num_receptors)
+    return list(extract_features(stepfile, windows))
+
+
+class StepfileFeatureTransformer(BaseEstimator, TransformerMixin):
+
+    """Computes difficulty features of stepfiles as a matrix with one row per
+    stepfile and one column per feature, for use in sklearn pipelines after
+    FFRChartTransformer.
+    """
+
+    def __init__(self, windows=(1.0, 5.0, 10.0), stream_gap=0.15, num_receptors=4):
+        """
+        Initializes the StepfileFeatureTransformer.
+
+        Args:
+            windows (Sequence[float]): Lengths in seconds of the rolling windows
+                over which notes per second are measured.
+            stream_gap (float): Maximum number of seconds between consecutive
+                steps of a stream.
+            num_receptors (int): Number of receptors of the stepfiles, which
+                sets the per-receptor jack features.
+        """
+        self.windows = windows
+        self.stream_gap = stream_gap
+        self.num_receptors = num_receptors
+
+    def fit(self, X, y=None):
+        """
+        Prepare the transformer. This is a no-op for this transformer since no fitting is needed.
+
+        Args:
+            X (List[Any]): Input stepfiles.
+            y (Optional[Any]): Optional target variable (not used).
+
+        Returns:
+            StepfileFeatureTransformer: Returns the instance itself.
+        """
+        #pylint: disable=invalid-name,unused-argument
+        return self
+
+    def transform(self, X, y=None):
+        """
+        Computes the features of every stepfile.
+
+        Args:
+            X (List[Any]): Stepfiles, charts in any format accepted by
+                acubed.encoding.decode_chart, or dictionaries with a 'chart' key
+                as produced by FFRChartTransformer.
+            y (Optional[Any]): Optional target variable (not used).
+
+        Returns:
+            np.ndarray: Matrix of features, with columns named by
+                get_feature_names_out().
+        """
+        #pylint: disable=invalid-name,unused-argument
+        rows = [
+            list(extract_features(_stepfile(x), self.windows, self.stream_gap).values())
+            for x in X
+        ]
+        return np.array(rows, dtype=np.float64).reshape(
+            len(rows), len(feature_names(self.windows, self.num_receptors)))
+
+    def get_feature_names_out(self, input_features=None):
+        """
+        Returns the names of the feature columns.
+        """
+        #pylint: disable=unused-argument
+        return np.array(feature_names(self.windows, self.num_receptors), dtype=object)
+
+
+def _stepfile(x: Any) -> Stepfile:
+    """
+    Returns the stepfile of a transformer input.
+    """
+    if isinstance(x, dict) and "chart" in x:
+        x = x["chart"]
+    return x if isinstance(x, Stepfile) else decode_chart(x)
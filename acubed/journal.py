@@ -0,0 +1,104 @@
+"""Module providing a progress journal to resume interrupted refreshes."""
+
+import base64
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, Set, TextIO
+
+
+class ProgressJournal:
+    """
+    Persists processed charts on local disk as they are downloaded, so that a
+    refresh interrupted by a crash or timeout can be resumed without
+    downloading the same levels again.
+
+    The journal is a JSON lines file with one processed chart per line, or
+    only the level of a chart already stored elsewhere, such as charts
+    written to MongoDB while streaming. Bytes, such as the arrays of binary
+    charts, are stored as base64 in a $binary object. A line truncated by a
+    crash is ignored when the journal is read back.
+
+    Parameters:
+        path (str): Location of the journal file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes the ProgressJournal with the given file location.
+        """
+        self.path = path
+
+    def replay(self, levels: Set[Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Reads the journal once, adding the level of every recorded chart to
+        levels and yielding the charts recorded in full.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    doc = json.loads(line, object_hook=_decode_binary)
+                except json.JSONDecodeError:
+                    continue
+                levels.add(doc["_id"])
+                if doc.keys() != {"_id"}:
+                    yield doc
+
+    def record(self, data: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Appends each chart of a stream to the journal before passing it on.
+        """
+        with self._open() as f:
+            for doc in data:
+                f.write(json.dumps(doc, default=_encode_binary) + "\n")
+                f.flush()
+                yield doc
+
+    def record_levels(self, levels: Iterable[Any]) -> None:
+        """
+        Appends levels to the journal without their charts.
+        """
+        with self._open() as f:
+            f.writelines(json.dumps({"_id": level}) + "\n" for level in levels)
+
+    def _open(self) -> TextIO:
+        """
+        Opens the journal for appending, ending a line truncated by a crash
+        first.
+        """
+        truncated = False
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, "rb") as tail:
+                tail.seek(-1, os.SEEK_END)
+                truncated = tail.read(1) != b"\n"
+
+        f = open(self.path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+        if truncated:
+            f.write("\n")
+        return f
+
+    def clear(self) -> None:
+        """
+        Deletes the journal file.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _encode_binary(value: Any) -> Dict[str, str]:
+    """
+    Encodes bytes as a $binary object holding their base64 representation.
+    """
+    if isinstance(value, bytes):
+        return {"$binary": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_binary(obj: Dict[str, Any]) -> Any:
+    """
+    Decodes a $binary object back into bytes, leaving other objects unchanged.
+    """
+    if obj.keys() == {"$binary"}:
+        return base64.b64decode(obj["$binary"])
+    return obj
@@ -0,0 +1,346 @@
+"""Module providing lightweight instrumentation of the refresh pipeline."""
+
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from types import FrameType
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.,
+                   30., 60.)
+DISABLED_TIMER = nullcontext()
+
+
+class Histogram:
+    """
+    Distribution of observed values, counted in cumulative buckets like a
+    Prometheus histogram.
+
+    Parameters:
+        buckets (Sequence[float]): Increasing upper bounds of the buckets. An
+            implicit last bucket holds values above every bound.
+    """
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Initializes an empty Histogram.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value: float) -> None:
+        """
+        Adds a value to the histogram.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile by interpolating within its bucket.
+        """
+        if not self.count:
+            return 0.
+        rank, seen = q * self.count, 0
+        for i, hits in enumerate(self.counts):
+            if seen + hits >= rank and hits:
+                lower = self.buckets[i - 1] if i else min(self.min, self.buckets[0])
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(max(lower + (upper - lower) * (rank - seen) / hits, self.min), self.max)
+            seen += hits
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the summary statistics of the histogram.
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else 0.,
+            "max": self.max if self.count else 0.,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+class Timer:
+    """
+    Context manager that observes its duration in seconds in a histogram.
+    """
+    __slots__ = ("metrics", "name", "start_time")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        """
+        Initializes the Timer for the given histogram.
+        """
+        self.metrics = metrics
+        self.name = name
+        self.start_time = 0.
+
+    def __enter__(self) -> "Timer":
+        """
+        Starts the timer.
+        """
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """
+        Stops the timer and records its duration.
+        """
+        self.metrics.observe(self.name, time.perf_counter() - self.start_time)
+
+
+class Metrics:
+    """
+    Registry of counters and histograms describing a refresh, such as bytes
+    downloaded, documents written and the latency of every stage.
+
+    A disabled registry ignores every update, and its timers are a shared
+    no-op context manager, so instrumented code pays for one attribute check.
+    Updates are thread-safe.
+
+    Parameters:
+        enabled (bool): Whether updates are recorded.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        """
+        Initializes an empty Metrics registry.
+        """
+        self.enabled = enabled
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: float = 1) -> None:
+        """
+        Increments a counter.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Adds a value to a histogram.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(value)
+
+    def timer(self, name: str) -> ContextManager[Any]:
+        """
+        Returns a context manager that observes its duration in seconds in a
+        histogram.
+        """
+        return Timer(self, name) if self.enabled else DISABLED_TIMER
+
+    def reset(self) -> None:
+        """
+        Removes every counter and histogram.
+        """
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the counters and histogram summaries.
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the counters and histograms in the Prometheus text format.
+        """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE acubed_{name} counter", f"acubed_{name} {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE acubed_{name} histogram")
+                total = 0
+                for bound, hits in zip([*map(str, histogram.buckets), "+Inf"], histogram.counts):
+                    total += hits
+                    lines.append(f'acubed_{name}_bucket{{le="{bound}"}} {total}')
+                lines += [f"acubed_{name}_sum {histogram.sum}",
+                          f"acubed_{name}_count {histogram.count}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Writes the metrics to a file, in the Prometheus text format if its
+        name ends with .prom and as JSON otherwise.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=2)
+
+
+class Recorder(Metrics):
+    """
+    Registry that keeps every observed value in order instead of summarizing
+    it, so that timings taken in a worker process can be sent back and
+    observed in the registry of the parent process.
+
+    Parameters:
+        enabled (bool): Whether updates are recorded.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        """
+        Initializes an empty Recorder.
+        """
+        super().__init__(enabled)
+        self.observations: List[Tuple[str, float]] = []
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Keeps a value observed in a histogram.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.observations.append((name, value))
+
+
+class SamplingProfiler:
+    """
+    Samples the call stacks of every other thread at a fixed interval, to find
+    where a refresh spends its time without instrumenting every function.
+
+    Samples are written in the collapsed stack format read by flame graph
+    tools such as flamegraph.pl and speedscope.
+
+    Parameters:
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """
+        Initializes the SamplingProfiler without starting it.
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        """
+        Starts sampling on a background thread.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops sampling.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path: str) -> None:
+        """
+        Writes the samples in the collapsed stack format.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, samples in self.samples.most_common():
+                f.write(f"{stack} {samples}\n")
+
+    def _run(self) -> None:
+        """
+        Records the stacks of all other threads until stopped.
+        """
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread, top in sys._current_frames().items():  # pylint: disable=protected-access
+                if thread == own:
+                    continue
+                stack = []
+                frame: Optional[FrameType] = top
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def __enter__(self) -> "SamplingProfiler":
+        """
+        Starts sampling.
+        """
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """
+        Stops sampling.
+        """
+        self.stop()
+
+
+REGISTRY = Metrics()
+
+
+def count(name: str, value: float = 1) -> None:
+    """
+    Increments a counter of the default registry.
+    """
+    REGISTRY.count(name, value)
+
+
+def observe(name: str, value: float) -> None:
+    """
+    Adds a value to a histogram of the default registry.
+    """
+    REGISTRY.observe(name, value)
+
+
+def timer(name: str) -> ContextManager[Any]:
+    """
+    Returns a timer of the default registry.
+    """
+    return REGISTRY.timer(name)
+
+
+@contextmanager
+def recording(enabled: bool) -> Iterator[List[Tuple[str, float]]]:
+    """
+    Replaces the default registry with a Recorder while the context is active,
+    and yields the list of (name, value) observations it keeps, which the
+    parent process passes to observe.
+    """
+    global REGISTRY  # pylint: disable=global-statement
+    recorder = Recorder(enabled)
+    registry, REGISTRY = REGISTRY, recorder
+    try:
+        yield recorder.observations
+    finally:
+        REGISTRY = registry
@@ -5,7 +5,18 @@
 
 import numpy as np
 from sklearn.base import BaseEstimator, TransformerMixin
-from acubed.datatypes import Note, Stepfile
+from acubed import metrics
+from acubed.datatypes import Stepfile
+from acubed.encoding import encode_chart
+
+NUM_RECEPTORS = 4
+
+CHART_OUTPUTS = {
+    'notes': lambda stepfile: stepfile.notes,
+    'records': lambda stepfile: stepfile.to_records(),
+    'stepfile': lambda stepfile: stepfile,
+    'binary': encode_chart,
+}
 
 class FFRChartTransformer(BaseEstimator, TransformerMixin):
 
@@ -21,11 +32,19 @@ class FFRChartTransformer(BaseEstimator, TransformerMixin):
     }
     """
 
-    def __init__(self):
+    def __init__(self, output='notes'):
         """
         Initializes the FFRChartTransformer. 
+
+        Args:
+            output (str): Format of the transformed chart. One of 'notes' for a
+                list of Note objects, 'records' for a list of dictionaries with
+                time and step keys (as produced by Note._asdict()), or 'stepfile'
+                for the array-backed Stepfile itself, or 'binary' for the compact
+                encoding of acubed.encoding.encode_chart. Only 'notes' creates
+                per-note Python objects besides the output dictionaries.
         """
-        return
+        self.output = output
 
     def fit(self, X, y=None):
         """
@@ -50,18 +69,53 @@ class FFRChartTransformer(BaseEstimator, TransformerMixin):
             y (Optional[Any]): Optional target variable (not used).
 
         Returns:
-            Dict[str, Any]: Dictionary with transformed chart data including Note objects.
+            Dict[str, Any]: Dictionary with transformed chart data in the format
+                selected by the output parameter.
         """
         #pylint: disable=invalid-name,unused-argument
+        return self.transform_many([X])[0]
 
-        data = np.array(X['chart'])[:, 1::2]
-        steps = np.array([''.join(i) for i in np.eye(4)[data[:, 0]].astype('<U1')])
-        times = (data[:, 1] - min(data[:, 1]))/1000.
+    def transform_many(self, X, y=None):
+        """
+        Transforms many charts at once. All charts are concatenated into flat
+        arrays with per-chart offsets, so that time normalization, step encoding,
+        zero-framer handling and chord merging run in a single vectorized pass
+        before the result is split back into one dictionary per chart.
 
-        return {
-            '_id': X['level'],
-            'name': X['name'],
-            'difficulty': X['difficulty'],
-            'preview': X['previewhash'],
-            'chart': Stepfile([Note(time = t, step = s) for t, s in zip(times, steps)]).notes
-        }
+        Args:
+            X (List[Dict[str, Any]]): Dictionaries containing chart data. Each
+                chart is a list of [frame, column, color, ms] rows, or an array
+                of them such as one decoded by acubed.payload.decode_payload,
+                which is used without a copy.
+            y (Optional[Any]): Optional target variable (not used).
+
+        Returns:
+            List[Dict[str, Any]]: Dictionaries with transformed chart data in the
+                format selected by the output parameter, in the order of X.
+        """
+        #pylint: disable=invalid-name,unused-argument
+        if self.output not in CHART_OUTPUTS:
+            raise ValueError(f"Output parameter must be one of {list(CHART_OUTPUTS)}.")
+
+        charts = [np.asarray(song['chart'])[:, 1::2] for song in X]
+        lengths = np.array([len(chart) for chart in charts], dtype=np.intp)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        data = np.concatenate(charts) if charts else np.empty((0, 2), dtype=np.intp)
+        steps = np.left_shift(1, NUM_RECEPTORS - 1 - data[:, 0])
+        starts = np.repeat(np.array([chart[:, 1].min() for chart in charts]), lengths)
+        times = (data[:, 1] - starts)/1000.
+        stepfiles = Stepfile.from_ragged(times, steps, offsets, num_receptors=NUM_RECEPTORS,
+                                         preprocess=True)
+
+        with metrics.timer('chart_output_seconds'):
+            return [
+                {
+                    '_id': song['level'],
+                    'name': song['name'],
+                    'difficulty': song['difficulty'],
+                    'preview': song['previewhash'],
+                    'chart': CHART_OUTPUTS[self.output](stepfile)
+                }
+                for song, stepfile in zip(X, stepfiles)
+            ]
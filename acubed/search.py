@@ -0,0 +1,247 @@
+"""Module providing a pattern search index over the step sequences of charts."""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from acubed.datatypes import Stepfile, unpack_steps
+
+
+class PatternIndex:  # pylint: disable=too-many-instance-attributes
+    """
+    An index that finds every chart containing a sequence of steps, such as
+    a roll, trill or jack, and the note offsets at which it occurs.
+
+    The steps of all charts are stored in shared flat arrays, and every run of
+    ngram consecutive steps is packed into one integer key of an inverted list
+    pointing at its positions. A pattern of at least ngram steps is looked up
+    through the rarest of its keys, and the candidates are verified against
+    the full pattern in one vectorized pass. Shorter patterns are matched with
+    a vectorized scan of the stored steps.
+
+    Charts can be added, replaced and removed at any time. Rows of removed
+    charts are left as holes, which are reclaimed once they make up most of
+    the stored rows.
+
+    Parameters:
+        ngram (int): Number of consecutive steps in every key.
+        num_receptors (int): Number of receptors of the indexed charts, $n$.
+    """
+
+    def __init__(self, ngram: int = 4, num_receptors: int = 4) -> None:
+        """
+        Initializes an empty PatternIndex.
+        """
+        if not 0 < ngram * num_receptors <= 63:
+            raise ValueError("The keys of ngram steps must fit in 63 bits.")
+        self.ngram = ngram
+        self.num_receptors = num_receptors
+        self.charts: Dict[Any, Tuple[int, int]] = {}
+        self._size = 0
+        self._steps = np.zeros(0, dtype=np.min_scalar_type(pow(2, num_receptors) - 1))
+        self._times = np.zeros(0, dtype=np.float64)
+        self._owners = np.zeros(0, dtype=np.intp)
+        self._notes = np.zeros(0, dtype=np.intp)
+        self._levels: List[Any] = []
+        self._postings: Dict[int, Dict[int, np.ndarray]] = {}
+        self._merged: Dict[int, np.ndarray] = {}
+
+    def add(self, level: Any, stepfile: Stepfile) -> None:
+        """
+        Indexes the chart of a level, replacing any chart indexed for it before.
+        """
+        if stepfile.num_receptors != self.num_receptors:
+            raise ValueError(f"Charts must have {self.num_receptors} receptors.")
+        if level in self.charts:
+            self.remove(level)
+
+        times, steps = stepfile.to_arrays()
+        start, end = self._size, self._size + len(steps)
+        self._reserve(end)
+        owner = len(self._levels)
+        self._levels.append(level)
+        self._steps[start:end] = steps
+        self._times[start:end] = times
+        self._owners[start:end] = owner
+        counts = unpack_steps(steps, self.num_receptors).sum(axis=1, dtype=np.intp)
+        self._notes[start:end] = np.cumsum(counts) - counts
+        self._size = end
+        self.charts[level] = (start, end)
+
+        keys = self._keys(start, end)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        for lo, hi in _runs(keys):
+            key = int(keys[lo])
+            self._postings.setdefault(key, {})[owner] = order[lo:hi] + start
+            self._merged.pop(key, None)
+
+    def update(self, charts: Iterable[Tuple[Any, Stepfile]]) -> None:
+        """
+        Indexes many (level, chart) pairs, such as the items of a ChartCorpus.
+        """
+        for level, stepfile in charts:
+            self.add(level, stepfile)
+
+    def remove(self, level: Any) -> None:
+        """
+        Removes the chart of a level from the index.
+        """
+        start, end = self.charts.pop(level)
+        owner = int(self._owners[start]) if end > start else -1
+        for key in np.unique(self._keys(start, end)).tolist():
+            del self._postings[key][owner]
+            if not self._postings[key]:
+                del self._postings[key]
+            self._merged.pop(key, None)
+        self._owners[start:end] = -1
+
+        if self._size > 1024 and sum(e - s for s, e in self.charts.values()) < self._size / 2:
+            self._compact()
+
+    def search(
+        self,
+        pattern: Sequence[Union[str, int]],
+        intervals: Optional[Sequence[float]] = None,
+        tolerance: float = 0.,
+    ) -> Dict[Any, np.ndarray]:
+        """
+        Finds every occurrence of a sequence of steps.
+
+        Args:
+            pattern (Sequence[Union[str, int]]): Steps to find, as binary step
+                strings or bitmasks.
+            intervals (Optional[Sequence[float]]): Seconds between consecutive
+                steps of the pattern. Timing is ignored if omitted.
+            tolerance (float): Maximum difference in seconds between every
+                interval of an occurrence and the pattern.
+
+        Returns:
+            Dict[Any, np.ndarray]: The note offsets at which the pattern starts
+                in every matching chart, usable as Stepfile indices.
+        """
+        masks = np.array([int(s, 2) if isinstance(s, str) else s for s in pattern],
+                         dtype=np.uint64)
+        if not masks.size:
+            raise ValueError("Pattern must contain at least one step.")
+        if intervals is not None and len(intervals) != masks.size - 1:
+            raise ValueError("Intervals must hold one value less than the pattern.")
+
+        positions = self._candidates(masks)
+        positions = positions[(positions >= 0) & (positions + masks.size <= self._size)]
+        owners = self._owners[positions]
+        matches = (owners >= 0) & (self._owners[positions + masks.size - 1] == owners)
+        for i, mask in enumerate(masks.tolist()):
+            matches &= self._steps[positions + i] == mask
+        if intervals is not None:
+            for i, interval in enumerate(intervals):
+                gaps = self._times[positions + i + 1] - self._times[positions + i]
+                matches &= np.abs(gaps - interval) <= tolerance
+        positions = np.sort(positions[matches])
+
+        owners = self._owners[positions]
+        return {
+            self._levels[owners[lo]]: self._notes[positions[lo:hi]]
+            for lo, hi in _runs(owners)
+        }
+
+    def _candidates(self, masks: np.ndarray) -> np.ndarray:
+        """
+        Returns the rows at which the pattern may start, from the postings of
+        its rarest ngram, or by scanning every row if it is shorter than an
+        ngram.
+        """
+        if masks.size >= self.ngram:
+            keys = [self._pack(masks[i:i + self.ngram])
+                    for i in range(masks.size - self.ngram + 1)]
+            shift, key = min(enumerate(keys), key=lambda k: self._count(k[1]))
+            return self._positions(key) - shift
+
+        count = max(self._size - masks.size + 1, 0)
+        found = self._steps[:count] == masks[0]
+        for i, mask in enumerate(masks[1:].tolist(), start=1):
+            found &= self._steps[i:i + count] == mask
+        return np.flatnonzero(found)
+
+    def _keys(self, start: int, end: int) -> np.ndarray:
+        """
+        Returns the packed keys of all runs of ngram steps within stored rows.
+        """
+        count = max(end - start - self.ngram + 1, 0)
+        keys = np.zeros(count, dtype=np.uint64)
+        for i in range(self.ngram):
+            keys <<= np.uint64(self.num_receptors)
+            keys |= self._steps[start + i:start + i + count]
+        return keys
+
+    def _pack(self, masks: np.ndarray) -> int:
+        """
+        Returns the packed key of a run of ngram steps.
+        """
+        key = 0
+        for mask in masks.tolist():
+            key = (key << self.num_receptors) | mask
+        return key
+
+    def _count(self, key: int) -> int:
+        """
+        Returns the number of positions of a key.
+        """
+        return sum(len(rows) for rows in self._postings.get(key, {}).values())
+
+    def _positions(self, key: int) -> np.ndarray:
+        """
+        Returns all positions of a key, merged across charts on first use.
+        """
+        if key not in self._merged:
+            rows = list(self._postings.get(key, {}).values())
+            self._merged[key] = np.concatenate(rows) if rows else np.zeros(0, dtype=np.intp)
+        return self._merged[key]
+
+    def _reserve(self, size: int) -> None:
+        """
+        Grows the stored rows to hold at least size rows, doubling their capacity.
+        """
+        if size <= len(self._steps):
+            return
+        capacity = max(size, 2 * len(self._steps), 1024)
+        for name in ("_steps", "_times", "_owners", "_notes"):
+            array = getattr(self, name)
+            grown = np.full(capacity, -1 if name == "_owners" else 0, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            setattr(self, name, grown)
+
+    def _compact(self) -> None:
+        """
+        Rebuilds the index from its live charts, reclaiming removed rows.
+        """
+        charts = [
+            (level, Stepfile.from_arrays(self._times[start:end].copy(),
+                                         self._steps[start:end].copy(), self.num_receptors))
+            for level, (start, end) in self.charts.items()
+        ]
+        index = PatternIndex(self.ngram, self.num_receptors)
+        index.update(charts)
+        self.__dict__.update(index.__dict__)
+
+    def __contains__(self, level: Any) -> bool:
+        """
+        Returns whether the chart of a level is indexed.
+        """
+        return level in self.charts
+
+    def __len__(self) -> int:
+        """
+        Returns the number of indexed charts.
+        """
+        return len(self.charts)
+
+
+def _runs(values: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Returns the (start, end) bounds of every run of equal values.
+    """
+    if not values.size:
+        return []
+    bounds = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1], [True])))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
@@ -0,0 +1,263 @@
+"""Module created to benchmark the chart transformation hot paths."""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from functools import partial
+from typing import Any, Callable, Dict, List, Tuple
+
+import bson
+import numpy as np
+
+from acubed.datatypes import Note, Stepfile
+from acubed.encoding import decode_chart, encode_chart
+from acubed.payload import decode_payload
+from acubed.preprocessing import FFRChartTransformer
+
+
+def make_payload(num_notes: int, seed: int = 0, zero_framers: float = 0.,
+                 chords: float = 0.) -> Dict[str, Any]:
+    """
+    Generates a song dictionary in the format of the FFR playlist merged with
+    an action=chart response, with one [frame, column, color, ms] row per note.
+    A zero_framers fraction of the notes repeats the time and column of the
+    previous note, and a chords fraction shares its time on another column.
+    """
+    rng = np.random.default_rng(seed)
+    gaps = rng.integers(0, 250, num_notes)
+    columns = rng.integers(0, 4, num_notes)
+    kinds = rng.random(num_notes)
+    repeated = kinds < zero_framers
+    chorded = (kinds >= zero_framers) & (kinds < zero_framers + chords)
+    gaps[1:][repeated[1:] | chorded[1:]] = 0
+    for i in np.flatnonzero(repeated[1:] | chorded[1:]) + 1:
+        columns[i] = columns[i - 1] if repeated[i] else (columns[i - 1] + columns[i] % 3 + 1) % 4
+    times = np.cumsum(gaps)
+    chart = np.column_stack([np.arange(num_notes), columns, np.zeros(num_notes, int), times])
+    return {
+        'level': seed,
+        'name': f'synthetic-{num_notes}',
+        'difficulty': 1,
+        'previewhash': '',
+        'chart': chart.tolist(),
+    }
+
+
+def legacy_transform(X: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Reference implementation of the chart produced by FFRChartTransformer.transform
+    followed by the Note._asdict() conversion, building one Note object per row.
+    """
+    #pylint: disable=invalid-name
+    data = np.array(X['chart'])[:, 1::2]
+    steps = np.array([''.join(i) for i in np.eye(4)[data[:, 0]].astype('<U1')])
+    times = (data[:, 1] - min(data[:, 1]))/1000.
+    notes = Stepfile([Note(time = t, step = s) for t, s in zip(times, steps)]).notes
+    return [note._asdict() for note in notes]
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    """
+    Returns the fastest wall-clock time in seconds over several runs.
+    """
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def benchmark_transform(payloads: List[Dict[str, Any]], repeat: int) -> None:
+    """
+    Compares the legacy per-note transform against the array-backed fast path.
+    """
+    transformer = FFRChartTransformer(output='records')
+    print(f"{'chart':<24}{'notes':>8}{'legacy (ms)':>14}{'records (ms)':>14}{'speedup':>10}")
+    for payload in payloads:
+        if legacy_transform(payload) != transformer.transform(payload)['chart']:
+            raise AssertionError(f"Transform outputs differ for {payload['name']}.")
+        legacy = best_of(partial(legacy_transform, payload), repeat)
+        fast = best_of(partial(transformer.transform, payload), repeat)
+        print(f"{payload['name']:<24}{len(payload['chart']):>8}"
+              f"{legacy * 1e3:>14.2f}{fast * 1e3:>14.2f}{legacy / fast:>9.1f}x")
+
+
+def benchmark_transform_many(payloads: List[Dict[str, Any]], repeat: int) -> None:
+    """
+    Compares transforming every chart separately against one batched pass.
+    """
+    transformer = FFRChartTransformer(output='records')
+    if [transformer.transform(p) for p in payloads] != transformer.transform_many(payloads):
+        raise AssertionError("Batched transform outputs differ.")
+    single = best_of(lambda: [transformer.transform(p) for p in payloads], repeat)
+    batched = best_of(partial(transformer.transform_many, payloads), repeat)
+    num_notes = sum(len(p['chart']) for p in payloads)
+    print(f"{len(payloads)} charts, {num_notes} notes: per chart {single * 1e3:.2f} ms, "
+          f"batched {batched * 1e3:.2f} ms ({single / batched:.1f}x)")
+
+
+def encode_document(stepfile: Stepfile) -> bytes:
+    """
+    Encodes a stepfile into a BSON document as stored by MongoDB.
+    """
+    return bson.encode({'chart': encode_chart(stepfile)})
+
+
+def decode_document(document: bytes) -> Stepfile:
+    """
+    Decodes a BSON document produced by encode_document into a stepfile.
+    """
+    return decode_chart(bson.decode(document)['chart'])
+
+
+def benchmark_encoding(payloads: List[Dict[str, Any]], repeat: int) -> None:
+    """
+    Compares the BSON size and encode/decode throughput of charts stored as
+    lists of time and step dictionaries against the binary encoding.
+    """
+    transformer = FFRChartTransformer(output='stepfile')
+    print(f"{'chart':<24}{'notes':>8}{'records (B)':>13}{'binary (B)':>12}"
+          f"{'encode (notes/s)':>18}{'decode (notes/s)':>18}")
+    for payload in payloads:
+        stepfile = transformer.transform(payload)['chart']
+        records = bson.encode({'chart': stepfile.to_records()})
+        binary = encode_document(stepfile)
+        decoded = decode_document(binary)
+        if repr(decoded) != repr(stepfile) or decoded.times.tobytes() != stepfile.times.tobytes():
+            raise AssertionError(f"Decoded chart differs for {payload['name']}.")
+        encode = best_of(partial(encode_document, stepfile), repeat)
+        decode = best_of(partial(decode_document, binary), repeat)
+        print(f"{payload['name']:<24}{len(stepfile.times):>8}{len(records):>13}{len(binary):>12}"
+              f"{len(stepfile.times) / encode:>18.0f}{len(stepfile.times) / decode:>18.0f}")
+
+
+def hot_paths(payload: Dict[str, Any], seed: int) -> Dict[str, Callable[[], Any]]:
+    """
+    Returns the hot paths guarded by the benchmark suite, each as a function
+    running it once on the given chart.
+    """
+    rng = np.random.default_rng(seed)
+    data = np.array(payload['chart'])[:, 1::2]
+    masks = np.left_shift(1, 3 - data[:, 0])
+    times = (data[:, 1] - data[:, 1].min()) / 1000.
+    steps = [f"{mask:04b}" for mask in masks.tolist()]
+    notes = [Note(time=t, step=s) for t, s in zip(times.tolist(), steps)]
+    pairs = [(Note(time=t, step='1000'), Note(time=t, step='0001')) for t in times.tolist()]
+    stepfile = Stepfile.from_arrays(times, masks, preprocess=True)
+    indices = rng.integers(0, len(stepfile), 1000).tolist()
+    transformer = FFRChartTransformer(output='records')
+    content = json.dumps({'chart': payload['chart']}).encode()
+    return {
+        'Note.__new__': lambda: [Note(time=t, step=s) for t, s in zip(times.tolist(), steps)],
+        'Note.__add__': lambda: [a + b for a, b in pairs],
+        'Stepfile.__init__': partial(Stepfile, notes),
+        'Stepfile._preprocess': partial(Stepfile.from_arrays, times, masks, preprocess=True),
+        'Stepfile.__getitem__': lambda: [stepfile[i] for i in indices],
+        'FFRChartTransformer.transform': partial(transformer.transform, payload),
+        'decode_payload': partial(decode_payload, content),
+    }
+
+
+def peak_memory(func: Callable[[], Any]) -> int:
+    """
+    Returns the peak memory in bytes allocated by one run of a function.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(sizes: List[int], repeat: int, zero_framers: float,
+              chords: float) -> Dict[str, Any]:
+    """
+    Measures the best time and peak memory of every hot path on synthetic
+    charts of each size.
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'benchmark':<40}{'notes':>8}{'time (ms)':>12}{'peak (KiB)':>12}")
+    for seed, size in enumerate(sizes):
+        payload = make_payload(size, seed, zero_framers, chords)
+        for name, func in hot_paths(payload, seed).items():
+            result = {'seconds': best_of(func, repeat), 'peak_bytes': peak_memory(func)}
+            results[f"{name}[{size}]"] = result
+            print(f"{name:<40}{size:>8}{result['seconds'] * 1e3:>12.3f}"
+                  f"{result['peak_bytes'] / 1024:>12.1f}")
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'zero_framers': zero_framers,
+        'chords': chords,
+        'results': results,
+    }
+
+
+def compare_suite(suite: Dict[str, Any], baseline: Dict[str, Any],
+                  threshold: float) -> List[Tuple[str, float]]:
+    """
+    Returns the benchmarks that are slower than their baseline by more than
+    the threshold, as a fraction, together with their slowdown.
+    """
+    regressions = []
+    for name, result in suite['results'].items():
+        if name in baseline['results']:
+            slowdown = result['seconds'] / baseline['results'][name]['seconds'] - 1
+            if slowdown > threshold:
+                regressions.append((name, slowdown))
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help='Number of notes in each synthetic chart.')
+    parser.add_argument('--payload', nargs='*', default=[],
+                        help='Recorded action=chart responses to benchmark instead.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--suite', action='store_true',
+                        help='Run the hot path suite instead of the transform comparisons.')
+    parser.add_argument('--zero-framers', type=float, default=0.05,
+                        help='Fraction of zero-framer notes in the suite charts.')
+    parser.add_argument('--chords', type=float, default=0.2,
+                        help='Fraction of chord notes in the suite charts.')
+    parser.add_argument('--save', help='Location to save the suite results as JSON.')
+    parser.add_argument('--baseline', help='Suite results to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Slowdown over the baseline flagged as a regression.')
+    args = parser.parse_args()
+
+    if args.suite:
+        suite_results = run_suite(args.sizes or [100, 1000, 10000, 50000], args.repeat,
+                                  args.zero_framers, args.chords)
+        if args.save:
+            with open(args.save, 'w', encoding='utf-8') as f:
+                json.dump(suite_results, f, indent=2)
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as f:
+                slowdowns = compare_suite(suite_results, json.load(f), args.threshold)
+            for benchmark, change in slowdowns:
+                print(f"REGRESSION {benchmark}: {change:+.1%} over baseline")
+            if slowdowns:
+                sys.exit(1)
+        sys.exit(0)
+
+    if args.payload:
+        songs = []
+        for level, path in enumerate(args.payload):
+            with open(path, encoding='utf-8') as f:
+                songs.append(dict(make_payload(0, level), name=path, chart=json.load(f)['chart']))
+    else:
+        songs = [make_payload(size, seed)
+                 for seed, size in enumerate(args.sizes or [2500, 5000, 10000, 20000])]
+
+    benchmark_transform(songs, args.repeat)
+    benchmark_transform_many(songs, args.repeat)
+    benchmark_encoding(songs, args.repeat)
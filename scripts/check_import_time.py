@@ -0,0 +1,108 @@
+"""Module created to check the import and startup time of acubed against a budget."""
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Tuple
+
+HEAVY_MODULES = ("numpy", "sklearn", "requests", "pymongo", "aiohttp")
+OFFLINE_CONFIG = {
+    "USERNAME": "import-check",
+    "FFR_API_KEY": "import-check",
+    "FFR_PLAYLIST_URL": "http://127.0.0.1:9/",
+    "MONGODB_URI": "mongodb://127.0.0.1:9/",
+}
+
+
+class Check(NamedTuple):
+    """
+    A statement run in a fresh interpreter, with its time budget and the
+    modules it must not import.
+
+    Attributes:
+        name (str): Name of the check in the report.
+        statement (str): Python statement to time.
+        budget_ms (float): Maximum milliseconds the statement may take.
+        forbidden (Tuple[str, ...]): Top-level modules the statement must not import.
+    """
+    name: str
+    statement: str
+    budget_ms: float
+    forbidden: Tuple[str, ...] = ()
+
+
+CHECKS = [
+    Check("import acubed", "import acubed", 20., HEAVY_MODULES),
+    Check("import acubed.metrics", "import acubed.metrics", 30., HEAVY_MODULES),
+    Check("import acubed.journal", "import acubed.journal", 30., HEAVY_MODULES),
+    Check("import acubed.connector", "import acubed.connector", 100., HEAVY_MODULES),
+    Check("from acubed import Stepfile", "from acubed import Stepfile", 300.,
+          ("sklearn", "requests", "pymongo", "aiohttp")),
+    Check("FFRDatabaseConnector()",
+          f"from acubed.connector import FFRDatabaseConnector; "
+          f"FFRDatabaseConnector({OFFLINE_CONFIG!r})", 400., ("numpy", "sklearn", "pymongo")),
+    Check("MongoDBConnector()",
+          f"from acubed.connector import MongoDBConnector; MongoDBConnector({OFFLINE_CONFIG!r})",
+          100., HEAVY_MODULES),
+]
+
+TIMER = """
+import sys, time, json
+start_time = time.perf_counter()
+{statement}
+print(json.dumps([time.perf_counter() - start_time, sorted(sys.modules)]))
+"""
+
+
+def run_check(check: Check, repeat: int) -> Tuple[float, List[str]]:
+    """
+    Runs a check in repeat fresh interpreters, returning its fastest time in
+    milliseconds and the forbidden modules it imported.
+    """
+    times = []
+    modules: List[str] = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", TIMER.format(statement=check.statement)],
+                                check=True, capture_output=True, text=True).stdout
+        seconds, modules = json.loads(output.splitlines()[-1])
+        times.append(seconds * 1e3)
+    imported = {module.split(".")[0] for module in modules}
+    return min(times), [module for module in check.forbidden if module in imported]
+
+
+def main() -> None:
+    """
+    Runs every check and exits with an error if any exceeds its budget or
+    imports a forbidden module. Use python -X importtime on a failing
+    statement to find the imports responsible.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of fresh interpreters each check runs in, '
+                             'keeping the fastest.')
+    parser.add_argument('--scale', type=float, default=1.,
+                        help='Multiplier of every budget, for slower machines.')
+    parser.add_argument('--save', help='Location to save the results as JSON.')
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, object]] = {}
+    failed = False
+    print(f"{'check':<30}{'ms':>10}{'budget':>10}  forbidden imports")
+    for check in CHECKS:
+        milliseconds, imported = run_check(check, args.repeat)
+        budget = check.budget_ms * args.scale
+        results[check.name] = {"ms": milliseconds, "budget_ms": budget, "forbidden": imported}
+        status = "" if milliseconds <= budget and not imported else "FAIL "
+        failed = failed or bool(status)
+        print(f"{check.name:<30}{milliseconds:>10.1f}{budget:>10.1f}  "
+              f"{status}{', '.join(imported)}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
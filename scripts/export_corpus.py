@@ -0,0 +1,28 @@
+"""Module created to export the charts in MongoDB into a local corpus file."""
+
+import argparse
+import time
+from dotenv import find_dotenv, dotenv_values
+from acubed.connector import MongoDBConnector
+from acubed.corpus import ChartCorpus, export_corpus
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', help='Location of the corpus file.')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Number of charts in each cursor batch.')
+    args = parser.parse_args()
+
+    start_time = time.time()
+
+    config = {
+        **dotenv_values(find_dotenv())
+    }
+
+    db = MongoDBConnector(config)
+    num_charts = export_corpus(
+        args.path, db.iter_charts(projection=['chart'], batch_size=args.batch_size))
+
+    print(f"--- Exported {num_charts} charts: {time.time() - start_time} seconds ---")
+    print(f"--- {ChartCorpus(args.path)} ---")
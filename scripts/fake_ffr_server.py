@@ -0,0 +1,162 @@
+"""Module created to serve a local stand-in of the FFR playlist and chart API."""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from aiohttp import web
+
+from scripts.benchmark import make_payload
+
+PLAYLIST_PATH = '/game/r3/r3-playlist.php'
+API_PATH = '/api/api.php'
+
+
+class Faults(NamedTuple):
+    """
+    Latency and server errors injected into the responses of a fake server.
+
+    Attributes:
+        latency (float): Minimum seconds before every response.
+        jitter (float): Maximum additional seconds before every response.
+        error_rate (float): Fraction of chart requests answered with a 500.
+        burst_every (float): Seconds between the starts of 503 bursts, during
+            which every chart request fails. Disabled with 0.
+        burst_length (float): Seconds that every 503 burst lasts.
+    """
+    latency: float = 0.
+    jitter: float = 0.
+    error_rate: float = 0.
+    burst_every: float = 0.
+    burst_length: float = 0.
+
+
+def add_fault_arguments(arguments: argparse.ArgumentParser, latency: float = 0.,
+                        jitter: float = 0., error_rate: float = 0.) -> None:
+    """
+    Adds the options of the injected faults and payloads to a parser.
+    """
+    arguments.add_argument('--payload-dir',
+                           help='Directory of recorded playlist.json and <level>.json payloads.')
+    arguments.add_argument('--latency', type=float, default=latency,
+                           help='Minimum seconds before every response.')
+    arguments.add_argument('--jitter', type=float, default=jitter,
+                           help='Maximum additional seconds before every response.')
+    arguments.add_argument('--error-rate', type=float, default=error_rate,
+                           help='Fraction of chart requests answered with a 500.')
+    arguments.add_argument('--burst-every', type=float, default=0.,
+                           help='Seconds between the starts of 503 bursts.')
+    arguments.add_argument('--burst-length', type=float, default=0.,
+                           help='Seconds that every 503 burst lasts.')
+    arguments.add_argument('--seed', type=int, default=0)
+
+
+def server_from_args(options: argparse.Namespace, num_songs: int) -> 'FakeFFRServer':
+    """
+    Creates a fake server from the options added by add_fault_arguments.
+    """
+    faults = Faults(options.latency, options.jitter, options.error_rate,
+                    options.burst_every, options.burst_length)
+    return FakeFFRServer(num_songs, options.payload_dir, faults, options.seed)
+
+
+class FakeFFRServer:  # pylint: disable=too-many-instance-attributes
+    """
+    Serves the playlist and action=chart responses of FFR from recorded or
+    synthetic payloads, with configurable latency and server errors.
+
+    Synthetic charts are generated on request from their level, so catalogs
+    many times the size of FFR do not need to fit in memory.
+
+    Parameters:
+        num_songs (int): Number of synthetic songs in the playlist.
+        payload_dir (Optional[str]): Directory of recorded payloads, holding
+            playlist.json and one <level>.json action=chart response per song.
+            Replaces the synthetic songs if set.
+        faults (Faults): Latency and server errors injected into responses.
+        seed (int): Seed of the synthetic charts and injected errors.
+    """
+
+    def __init__(self, num_songs: int = 3000, payload_dir: Optional[str] = None,
+                 faults: Faults = Faults(), seed: int = 0) -> None:
+        """
+        Initializes the FakeFFRServer and its playlist.
+        """
+        self.payload_dir = payload_dir
+        self.faults = faults
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.start_time = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+
+        if payload_dir:
+            with open(os.path.join(payload_dir, 'playlist.json'), encoding='utf-8') as f:
+                self.playlist: List[Dict[str, Any]] = json.load(f)
+        else:
+            self.playlist = [
+                {key: value for key, value in make_payload(0, level).items() if key != 'chart'}
+                for level in range(1, num_songs + 1)
+            ]
+        self.levels = {str(song['level']) for song in self.playlist}
+
+    def app(self) -> web.Application:
+        """
+        Returns the aiohttp application serving the playlist and chart API.
+        """
+        app = web.Application()
+        app.router.add_get(PLAYLIST_PATH, self.get_playlist)
+        app.router.add_get(API_PATH, self.get_chart)
+        return app
+
+    async def get_playlist(self, request: web.Request) -> web.Response:
+        """
+        Responds with the playlist.
+        """
+        #pylint: disable=unused-argument
+        return web.json_response(self.playlist)
+
+    async def get_chart(self, request: web.Request) -> web.StreamResponse:
+        """
+        Responds to an action=chart request after the configured latency, or
+        with an injected server error.
+        """
+        self.requests += 1
+        await asyncio.sleep(self.faults.latency + self.random.uniform(0, self.faults.jitter))
+
+        level = request.query.get('level', '')
+        if request.query.get('action') != 'chart' or level not in self.levels:
+            return web.json_response({'error': 'unknown level'}, status=404)
+        elapsed = time.monotonic() - self.start_time
+        if self.faults.burst_every and elapsed % self.faults.burst_every < self.faults.burst_length:
+            self.errors += 1
+            return web.Response(status=503)
+        if self.random.random() < self.faults.error_rate:
+            self.errors += 1
+            return web.Response(status=500)
+
+        if self.payload_dir:
+            return web.FileResponse(os.path.join(self.payload_dir, f'{level}.json'))
+        num_notes = random.Random(self.seed * 1_000_003 + int(level)).randint(200, 3000)
+        return web.json_response({'chart': make_payload(num_notes, int(level))['chart']})
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--songs', type=int, default=3000,
+                        help='Number of synthetic songs in the playlist.')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args, args.songs)
+    print(f"--- Serving {len(server.playlist)} songs: "
+          f"FFR_API_URL=http://{args.host}:{args.port}{API_PATH} "
+          f"FFR_PLAYLIST_URL=http://{args.host}:{args.port}{PLAYLIST_PATH} ---")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None)
@@ -0,0 +1,163 @@
+"""Module created to load-test the refresh pipeline against local stand-ins of FFR and MongoDB."""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+import requests
+from aiohttp import web
+
+from acubed.connector import FFRDatabaseConnector, MongoDBConnector
+from scripts.fake_ffr_server import (
+    API_PATH,
+    PLAYLIST_PATH,
+    FakeFFRServer,
+    add_fault_arguments,
+    server_from_args,
+)
+from scripts.refresh_database import parse_args, refresh
+
+
+class TimedFFRDatabaseConnector(FFRDatabaseConnector):
+    """
+    FFRDatabaseConnector that records the latency of every request.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Initializes the connector with an empty list of latencies.
+        """
+        self.latencies: List[float] = []
+        super().__init__(*args, **kwargs)
+
+    def get(self, url: str) -> requests.Response:
+        """
+        Performs a GET request and records its latency in seconds.
+        """
+        start_time = time.perf_counter()
+        try:
+            return super().get(url)
+        finally:
+            self.latencies.append(time.perf_counter() - start_time)
+
+
+@contextmanager
+def serving(server: FakeFFRServer, host: str, port: int) -> Iterator[str]:
+    """
+    Runs a fake FFR server on a background event loop, yielding its base URL.
+    """
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(server.app())
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, host, port).start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def mongo_client(uri: str) -> Any:
+    """
+    Returns a client of a local MongoDB deployment, or of an in-memory
+    stand-in if no URI is given.
+    """
+    if uri:
+        from pymongo import MongoClient  # pylint: disable=import-outside-toplevel
+        return MongoClient(uri)
+    try:
+        import mongomock  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise SystemExit("Install mongomock or pass --mongodb-uri of a local mongod.") from error
+    return mongomock.MongoClient()
+
+
+def run_scale(options: argparse.Namespace, refresh_options: argparse.Namespace,
+              scale: int) -> Dict[str, Any]:
+    """
+    Runs the refresh pipeline against a fake FFR server whose catalog is the
+    given multiple of the current catalog size, and measures it.
+    """
+    server = server_from_args(options, options.catalog * scale)
+    client = mongo_client(options.mongodb_uri)
+    client.drop_database("ffr")
+
+    with serving(server, options.host, options.port) as url:
+        config = {
+            "USERNAME": "load-test",
+            "FFR_API_KEY": "load-test",
+            "FFR_API_URL": f"{url}{API_PATH}",
+            "FFR_PLAYLIST_URL": f"{url}{PLAYLIST_PATH}",
+            "FFR_ERROR_DELAY": options.error_delay,
+        }
+        start_time = time.perf_counter()
+        ffr = TimedFFRDatabaseConnector(config, chart_format=refresh_options.chart_format)
+        changes = refresh(ffr, MongoDBConnector(config, client=client), refresh_options)
+        seconds = time.perf_counter() - start_time
+
+    latencies = np.array(ffr.latencies) * 1e3
+    return {
+        "scale": scale,
+        "songs": len(server.playlist),
+        "seconds": seconds,
+        "charts_per_second": len(server.playlist) / seconds,
+        "requests": server.requests,
+        "injected_errors": server.errors,
+        "failed_levels": len(ffr.failed_levels),
+        "written": changes["nUpserted"] + changes["nMatched"],
+        **{f"p{q}_ms": float(np.percentile(latencies, q)) if latencies.size else 0.
+           for q in (50, 95, 99)},
+        "max_ms": max(latencies.tolist(), default=0.),
+    }
+
+
+def main():
+    """
+    Load-tests the refresh pipeline at every catalog scale and reports its
+    throughput and request latency.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        epilog='Options after -- are passed on to scripts.refresh_database.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 5, 10, 20],
+                        help='Multiples of the catalog size to test.')
+    parser.add_argument('--catalog', type=int, default=3000,
+                        help='Number of songs in the current catalog.')
+    add_fault_arguments(parser, latency=0.02, jitter=0.03, error_rate=0.01)
+    parser.add_argument('--error-delay', type=float, default=0.,
+                        help='Seconds the connector waits after a server error.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mongodb-uri', default='',
+                        help='URI of a local mongod. An in-memory stand-in is used if omitted.')
+    parser.add_argument('--save', help='Location to save the results as JSON.')
+    args, rest = parser.parse_known_args()
+
+    refresh_args = parse_args([arg for arg in rest if arg != '--'])
+    results = []
+    print(f"{'scale':>6}{'songs':>8}{'seconds':>10}{'charts/s':>10}{'p50 (ms)':>10}"
+          f"{'p95 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}{'errors':>8}{'failed':>8}")
+    for multiple in args.scales:
+        result = run_scale(args, refresh_args, multiple)
+        results.append(result)
+        print(f"{result['scale']:>6}{result['songs']:>8}{result['seconds']:>10.1f}"
+              f"{result['charts_per_second']:>10.1f}{result['p50_ms']:>10.1f}"
+              f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['max_ms']:>10.1f}"
+              f"{result['injected_errors']:>8}{result['failed_levels']:>8}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,120 @@
 """Module created to refresh the MongoDB database with new FFR stepfiles."""
 
+import argparse
 import logging
 import time
+from contextlib import nullcontext
+from itertools import chain
+from typing import Any, Set
 from dotenv import find_dotenv, dotenv_values
+from acubed import metrics
+from acubed.cache import ResponseCache
 from acubed.connector import FFRDatabaseConnector, MongoDBConnector
+from acubed.journal import ProgressJournal
 
-# def main(config):
-#     """ Runs data processing scripts to turn raw data from (../raw) into
-#         cleaned data ready to be analyzed (saved in ../processed).
-#     """
 
-if __name__ == '__main__':
+def require_complete(data, connector):
+    """
+    Passes on a stream of charts, raising once it is exhausted if any level
+    failed to download, so that a rebuild does not drop the failed levels.
+    """
+    yield from data
+    if connector.failed_levels:
+        raise RuntimeError(f"Rebuild aborted, run again with --resume to retry: "
+                           f"{connector.failed_levels}")
+
+def parse_args(argv=None):
+    """
+    Parses the command line options of the refresh.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stream', action='store_true',
+                        help='Write charts to MongoDB in batches while downloading.')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Replace the whole collection through a staging collection.')
+    parser.add_argument('--chart-format', choices=['records', 'binary'], default='records',
+                        help='Format of the stored charts. Use binary once the collection '
+                             'has been migrated with MongoDBConnector.encode_charts.')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='Worker processes used to decode and transform charts.')
+    parser.add_argument('--queue-depth', type=int, default=64,
+                        help='Maximum number of downloads and transforms in flight.')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Number of charts in each bulk write when streaming or rebuilding.')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Number of times failed downloads are retried.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Only download levels missing from the progress journal.')
+    parser.add_argument('--journal',
+                        help='Location of a progress journal of processed charts, so that an '
+                             'interrupted refresh can be resumed. Only levels are journaled '
+                             'with --stream. Disabled if omitted.')
+    parser.add_argument('--cache-dir',
+                        help='Directory of the HTTP response cache. Disabled if omitted.')
+    parser.add_argument('--cache-ttl', type=float, default=86400,
+                        help='Seconds to reuse cached responses the server cannot revalidate.')
+    parser.add_argument('--cache-size', type=int, default=1 << 30,
+                        help='Maximum size of the HTTP response cache in bytes.')
+    parser.add_argument('--metrics',
+                        help='Location to write per-stage timings and counters to, in the '
+                             'Prometheus text format if it ends with .prom and as JSON '
+                             'otherwise. Disabled if omitted.')
+    parser.add_argument('--profile',
+                        help='Location to write sampled call stacks to, in the collapsed '
+                             'format of flame graph tools. Disabled if omitted.')
+    parser.add_argument('--profile-interval', type=float, default=0.005,
+                        help='Seconds between samples of the profiler.')
+    args = parser.parse_args(argv)
+    if args.resume and not args.journal:
+        parser.error('--resume requires --journal')
+    return args
+
+
+def refresh(ffr, db, args):
+    """
+    Downloads every chart with the FFR connector and writes them with the
+    MongoDB connector, returning the database changes.
+    """
+    start_time = time.time()
+
+    journal = ProgressJournal(args.journal) if args.journal else None
+    if journal is not None and not args.resume:
+        journal.clear()
+
+    # Replaying the journal fills done before iter_charts starts downloading
+    done: Set[Any] = set()
+    charts = ffr.iter_charts(args.processes, args.queue_depth, retries=args.retries, exclude=done)
+    if journal is not None:
+        if not args.stream or args.rebuild:
+            charts = journal.record(charts)
+        charts = chain(journal.replay(done), charts)
+
+    if args.rebuild:
+        rebuilt = db.rebuild(require_complete(charts, ffr), batch_size=args.batch_size)
+        database_changes = dict(rebuilt, nSkipped=0, nMatched=0, upserted=[])
+        database_changes['nUpserted'] = database_changes['nInserted']
+    elif args.stream:
+        database_changes = db.upsert_stream(
+            charts, batch_size=args.batch_size,
+            on_written=journal.record_levels if journal is not None else None)
+    else:
+        stepfiles = {d['_id']: d for d in charts}
+
+        print(f"--- Downloaded Charts: {time.time() - start_time} seconds ---")
+
+        database_changes = db.upsert(stepfiles.values())
+
+    if journal is not None and not ffr.failed_levels and not database_changes.get('writeErrors'):
+        journal.clear()
+    return database_changes
+
+
+def main(argv=None):
+    """
+    Refreshes the MongoDB database with the charts on FFR, using the
+    configuration in the .env file.
+    """
+    args = parse_args(argv)
 
     start_time = time.time()
 
@@ -19,32 +123,33 @@ if __name__ == '__main__':
     }
 
     ## Completes in 0.061 seconds per song (goes through all songs in game)
-    ffr = FFRDatabaseConnector(config)
-    stepfiles = ffr.download_charts()
-
-    print(f"--- Downloaded Charts: {time.time() - start_time} seconds ---")
-
+    cache = None
+    if args.cache_dir:
+        cache = ResponseCache(args.cache_dir, args.cache_ttl, args.cache_size)
+    ffr = FFRDatabaseConnector(config, cache=cache, chart_format=args.chart_format)
     db = MongoDBConnector(config)
-    database_changes = db.upsert(stepfiles.values())
-    upserts = database_changes['upserted']
+
+    metrics.REGISTRY.enabled = bool(args.metrics)
+    profiler = metrics.SamplingProfiler(args.profile_interval) if args.profile else None
+    try:
+        with profiler or nullcontext(), metrics.timer("refresh_seconds"):
+            database_changes = refresh(ffr, db, args)
+    finally:
+        if args.metrics:
+            metrics.REGISTRY.write(args.metrics)
+        if profiler:
+            profiler.write(args.profile)
 
     print(f"--- Updated MongoDB database with new charts: {time.time() - start_time} seconds ---")
+    print(f"--- Skipped {database_changes['nSkipped']}, inserted {database_changes['nUpserted']}, "
+          f"updated {database_changes['nMatched']} charts ---")
+
+    if ffr.failed_levels:
+        print(f"--- Failed levels, run again with --resume to retry: {ffr.failed_levels} ---")
 
     logger = logging.getLogger(__name__)
     logger.info('making final data set from raw data')
 
 
-# if __name__ == '__main__':
-#     LOG_FMT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-#     logging.basicConfig(level=logging.INFO, format=LOG_FMT)
-
-#     # # not used in this stub but often useful for finding various files
-#     # project_dir = Path(__file__).resolve().parents[2]
-
-#     # find .env automagically by walking up directories until it's found, then
-#     # load up the .env entries as environment variables
-
-#     env = {
-#         **dotenv_values(find_dotenv())
-#     }
-#     main(env)
+if __name__ == '__main__':
+    main()